@@ -0,0 +1,27 @@
+# server-vision-pipeline/common/config.py
+from __future__ import annotations
+import functools, os
+from pathlib import Path
+from typing import Any, Dict
+
+import yaml
+
+try:  # libyaml bindings; pure-Python loader if PyYAML was built without them
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:  # pragma: no cover
+    from yaml import SafeLoader
+
+@functools.lru_cache(maxsize=32)
+def _load(path_str: str, mtime_ns: int) -> Dict[str, Any]:
+    with open(path_str, "r", encoding="utf-8") as f:
+        return yaml.load(f, Loader=SafeLoader) or {}
+
+def load_yaml(path: str | Path) -> Dict[str, Any]:
+    """
+    Parse a YAML file with the C safe loader, cached by (path, mtime) so
+    repeated loads of an unchanged file are free and an edited file is
+    re-read. Raises FileNotFoundError like open(). Callers must not mutate
+    the result.
+    """
+    p = str(path)
+    return _load(p, os.stat(p).st_mtime_ns)
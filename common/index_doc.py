@@ -0,0 +1,86 @@
+# server-vision-pipeline/common/index_doc.py
+from __future__ import annotations
+import functools, os
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import orjson
+
+def _load_json(path: Path) -> Optional[dict]:
+    try:
+        return orjson.loads(path.read_bytes())
+    except Exception:
+        return None
+
+def _mtime_ns(path: Path) -> int:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return -1
+
+@functools.lru_cache(maxsize=4096)
+def _load_enrichment(dir_str: str, desc_mtime_ns: int, dets_mtime_ns: int) -> Tuple[dict, dict]:
+    """
+    (description.json, detections.json) for a landing dir. Keyed by the files'
+    mtimes so retries/replays of the same frame skip the re-read, while a
+    rewritten file busts the entry. Callers must not mutate the results.
+    """
+    d = Path(dir_str)
+    desc = (_load_json(d / "description.json") or {}) if desc_mtime_ns >= 0 else {}
+    dets = (_load_json(d / "detections.json") or {}) if dets_mtime_ns >= 0 else {}
+    return desc, dets
+
+def utc_now_iso() -> str:
+    return datetime.utcnow().isoformat(timespec="milliseconds") + "Z"
+
+def build_index_doc(man: Dict[str, Any], enrich_files: bool = True,
+                    indexed_at: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Build a flat, index-friendly record combining manifest + optional files
+    (description.json, detections.json) found in the landing directory.
+    Shared by indexer_worker (stream) and indexer_stub (batch rebuild).
+    Pass `indexed_at` (see utc_now_iso) to stamp a whole batch with one value.
+    """
+    ingest = man.get("ingest", {}) or {}
+    d = Path(ingest.get("dir", "")) if "dir" in ingest else None
+
+    desc: dict = {}
+    dets: dict = {}
+    if enrich_files and d and d.exists():
+        desc, dets = _load_enrichment(
+            str(d), _mtime_ns(d / "description.json"), _mtime_ns(d / "detections.json")
+        )
+
+    # flatten a few helpful fields
+    rec = {
+        "frame_id": man.get("frame_id"),
+        "camera_id": man.get("camera_id"),
+        "ts": man.get("ts"),
+        "scene": man.get("scene"),
+        "person_present": man.get("person_present"),
+        "pet_present": man.get("pet_present"),
+        "vehicles_present": man.get("vehicles_present"),
+        "activities": man.get("activities", []),
+        "ingest_dir": str(d) if d else None,
+        "files": {
+            "frame": str(d / "frame.jpg") if d else None,
+            "tagged": str(d / "tagged.jpg") if d else None,
+            "detections": str(d / "detections.json") if d else None,
+            "description": str(d / "description.json") if d else None,
+        },
+        "hashes": man.get("hashes", {}),
+        "saved_bytes": man.get("saved_bytes", {}),
+        "objects": [o.get("label") for o in (dets.get("objects") or []) if isinstance(o, dict)],
+        "people": [p.get("description") for p in (desc.get("people") or []) if isinstance(p, dict)],
+        "pets": [p.get("description") for p in (desc.get("pets") or []) if isinstance(p, dict)],
+        "vehicles": [v.get("description") for v in (desc.get("vehicles") or []) if isinstance(v, dict)],
+        "scene_text": orjson.dumps({
+            "scene": (desc.get("scene")),
+            "objects": (desc.get("objects") or []),
+            "activities": (desc.get("activities") or []),
+        }).decode(),
+        "indexed_at": indexed_at or utc_now_iso(),
+    }
+    # drop Nones for cleanliness
+    return {k: v for k, v in rec.items() if v is not None}
@@ -1,7 +1,7 @@
 # server-vision-pipeline/common/logging.py
 from __future__ import annotations
-import logging, os
-from logging.handlers import RotatingFileHandler
+import atexit, logging, os, queue, threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pathlib import Path
 from typing import Optional
 
@@ -13,6 +13,9 @@ _LEVELS = {
     "DEBUG": logging.DEBUG,
 }
 
+_LOCK = threading.Lock()
+_LISTENERS: dict[str, QueueListener] = {}  # keeps listener threads referenced
+
 def _level_from_env(default: str = "INFO") -> int:
     return _LEVELS.get(os.getenv("LOG_LEVEL", default).upper(), logging.INFO)
 
@@ -20,13 +23,21 @@ def get_logger(name: str, log_dir: str = "logs", level: Optional[str] = None) ->
     """
     Rotating file + console logger.
     - logs/<name>.log (5 MB x 5 files)
+    - callers only enqueue records; a background QueueListener thread does
+      the formatting + file/console I/O, so hot loops never block on disk
     - honors LOG_LEVEL env or provided level
-    - idempotent (safe to call multiple times)
+    - idempotent (safe to call multiple times, including concurrently)
     """
     logger = logging.getLogger(name)
     if logger.handlers:  # already configured
         return logger
 
+    with _LOCK:
+        if logger.handlers:  # configured by a concurrent first call
+            return logger
+        return _configure(logger, name, log_dir, level)
+
+def _configure(logger: logging.Logger, name: str, log_dir: str, level: Optional[str]) -> logging.Logger:
     Path(log_dir).mkdir(parents=True, exist_ok=True)
     log_level = _LEVELS.get(level.upper(), _level_from_env()) if level else _level_from_env()
 
@@ -41,6 +52,7 @@ def get_logger(name: str, log_dir: str = "logs", level: Optional[str] = None) ->
         maxBytes=5_000_000,
         backupCount=5,
         encoding="utf-8",
+        delay=True,  # open on first emit, not at import
     )
     fh.setFormatter(fmt)
     fh.setLevel(log_level)
@@ -50,8 +62,20 @@ def get_logger(name: str, log_dir: str = "logs", level: Optional[str] = None) ->
     ch.setFormatter(fmt)
     ch.setLevel(log_level)
 
-    logger.addHandler(fh)
-    logger.addHandler(ch)
+    q: queue.SimpleQueue = queue.SimpleQueue()
+    listener = QueueListener(q, fh, ch, respect_handler_level=True)
+    listener.start()
+    _LISTENERS[name] = listener
+
+    logger.addHandler(QueueHandler(q))
     logger.setLevel(log_level)
     logger.propagate = False
     return logger
+
+@atexit.register
+def shutdown_logging() -> None:
+    """Drain queued records and stop listener threads (runs at interpreter exit)."""
+    with _LOCK:
+        for listener in _LISTENERS.values():
+            listener.stop()
+        _LISTENERS.clear()
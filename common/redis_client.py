@@ -0,0 +1,27 @@
+# server-vision-pipeline/common/redis_client.py
+from __future__ import annotations
+import socket
+
+from redis import asyncio as aioredis
+
+# Linux keepalive knobs; skipped on platforms that don't expose them.
+_KEEPALIVE_OPTS = {
+    opt: val
+    for name, val in (("TCP_KEEPIDLE", 60), ("TCP_KEEPINTVL", 10), ("TCP_KEEPCNT", 3))
+    if (opt := getattr(socket, name, None)) is not None
+}
+
+def from_url(url: str, decode_responses: bool = True, max_connections: int = 16) -> aioredis.Redis:
+    """
+    Long-lived asyncio Redis client with TCP keepalive and periodic health
+    checks, so idle consumers notice dead connections instead of hanging.
+    (asyncio already sets TCP_NODELAY on its TCP transports.)
+    """
+    return aioredis.from_url(
+        url,
+        decode_responses=decode_responses,
+        socket_keepalive=True,
+        socket_keepalive_options=_KEEPALIVE_OPTS,
+        health_check_interval=30,
+        max_connections=max_connections,
+    )
@@ -1,15 +1,177 @@
 from __future__ import annotations
+import hashlib
+import sqlite3
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+
 import chromadb
+import numpy as np
+from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
 from chromadb.utils.embedding_functions import SentenceTransformerEmbeddingFunction
 from common.logging import get_logger
 
 log = get_logger("chroma_store")
 
+
+def _doc_key(doc: str) -> str:
+    return hashlib.blake2b(doc.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def path_hash(path: str) -> str:
+    """Short key for a resolved JSON path, stored as `path_h` metadata for exact lookups."""
+    return hashlib.blake2b(path.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def _simhash(doc: str) -> int:
+    """64-bit SimHash over whitespace tokens; near-duplicate texts differ in few bits."""
+    toks = doc.lower().split()
+    if not toks:
+        return 0
+    hs = np.array(
+        [int.from_bytes(hashlib.blake2b(t.encode("utf-8"), digest_size=8).digest(), "little") for t in toks],
+        dtype=np.uint64,
+    )
+    bits = np.unpackbits(hs.view(np.uint8).reshape(-1, 8), axis=1, bitorder="little")
+    votes = bits.sum(axis=0, dtype=np.int64) * 2 - len(toks)
+    return int(np.packbits(votes > 0, bitorder="little").view(np.uint64)[0])
+
+
+class EmbeddingCache:
+    """
+    Content-hash keyed embedding cache: a bounded in-memory LRU, optionally
+    backed by a SQLite file (float16, half the bytes) so embeddings survive
+    restarts. Scoped per model name.
+    """
+
+    def __init__(self, model_name: str, cache_dir: Optional[str] = None, maxsize: int = 10_000):
+        self.model_name = model_name
+        self.maxsize = maxsize
+        self._mem: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._db: Optional[sqlite3.Connection] = None
+        if cache_dir:
+            Path(cache_dir).mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(Path(cache_dir) / "embeddings.sqlite"), check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS emb_f16(model TEXT, key TEXT, vec BLOB, PRIMARY KEY(model, key))"
+            )
+            self._db.commit()
+
+    def _remember(self, key: str, vec: np.ndarray) -> None:
+        self._mem[key] = vec
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.maxsize:
+            self._mem.popitem(last=False)
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        found: Dict[str, np.ndarray] = {}
+        for k in keys:
+            if k in self._mem:
+                self._mem.move_to_end(k)
+                found[k] = self._mem[k]
+        missing = list(dict.fromkeys(k for k in keys if k not in found))
+        if self._db is not None and missing:
+            # stay well under SQLite's bound-parameter limit
+            for i in range(0, len(missing), 500):
+                chunk = missing[i:i + 500]
+                rows = self._db.execute(
+                    f"SELECT key, vec FROM emb_f16 WHERE model=? AND key IN ({','.join('?' * len(chunk))})",
+                    [self.model_name, *chunk],
+                ).fetchall()
+                for k, blob in rows:
+                    vec = np.frombuffer(blob, dtype=np.float16).astype(np.float32)
+                    self._remember(k, vec)
+                    found[k] = vec
+        return found
+
+    def put_many(self, items: Dict[str, np.ndarray]) -> None:
+        for k, v in items.items():
+            self._remember(k, v)
+        if self._db is not None and items:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO emb_f16 VALUES (?,?,?)",
+                [(self.model_name, k, v.astype(np.float16).tobytes()) for k, v in items.items()],
+            )
+            self._db.commit()
+
+
+class CachedEmbeddingFunction(EmbeddingFunction):
+    """
+    Chroma embedding function that consults an EmbeddingCache before the
+    model, so both upserts and query texts skip the encoder for text seen
+    before. Misses are deduplicated, sorted by length (similar-length
+    batches pad less) and embedded `batch_size` at a time.
+
+    With `fuzzy_distance` > 0, a miss whose SimHash is within that many bits
+    of a recently embedded document reuses that vector instead (near-identical
+    scene summaries from the same camera). Off by default.
+    """
+
+    def __init__(self, inner: EmbeddingFunction, cache: EmbeddingCache, batch_size: int = 64,
+                 fuzzy_distance: int = 0, fuzzy_window: int = 2048):
+        self.inner = inner
+        self.cache = cache
+        self.batch_size = batch_size
+        self.fuzzy_distance = fuzzy_distance
+        self.fuzzy_window = fuzzy_window
+        self._recent: "OrderedDict[str, int]" = OrderedDict()  # key -> simhash
+
+    def _fuzzy_lookup(self, doc: str) -> Optional[np.ndarray]:
+        sh = _simhash(doc)
+        for key, other in reversed(self._recent.items()):
+            if (sh ^ other).bit_count() <= self.fuzzy_distance:
+                hit = self.cache.get_many([key]).get(key)
+                if hit is not None:
+                    return hit
+        return None
+
+    def _track(self, key: str, doc: str) -> None:
+        self._recent[key] = _simhash(doc)
+        while len(self._recent) > self.fuzzy_window:
+            self._recent.popitem(last=False)
+
+    def __call__(self, input: Documents) -> Embeddings:
+        keys = [_doc_key(d) for d in input]
+        vecs = self.cache.get_many(keys)
+        misses = {k: d for k, d in zip(keys, input) if k not in vecs}
+
+        if self.fuzzy_distance > 0 and misses:
+            reused = {}
+            for k, d in misses.items():
+                hit = self._fuzzy_lookup(d)
+                if hit is not None:
+                    reused[k] = hit
+            self.cache.put_many(reused)
+            vecs.update(reused)
+            for k in reused:
+                del misses[k]
+
+        todo = sorted(misses.items(), key=lambda kv: len(kv[1]))
+        for i in range(0, len(todo), self.batch_size):
+            chunk = todo[i:i + self.batch_size]
+            embs = self.inner([d for _, d in chunk])
+            fresh = {k: np.asarray(e, dtype=np.float32) for (k, _), e in zip(chunk, embs)}
+            self.cache.put_many(fresh)
+            vecs.update(fresh)
+            if self.fuzzy_distance > 0:
+                for k, d in chunk:
+                    self._track(k, d)
+        log.debug("Embeddings: %d docs, %d embedded, %d cached", len(input), len(misses), len(input) - len(misses))
+        return [vecs[k].tolist() for k in keys]
+
+
 class ChromaRAG:
-    def __init__(self, path: str, collection: str, model_name: str):
-        log.info(f"Init Chroma: path={path} collection={collection} model={model_name}")
+    def __init__(self, path: str, collection: str, model_name: str,
+                 cache_dir: str | None = None, embed_batch: int = 64, upsert_batch: int = 1024,
+                 cache_size: int = 10_000, fuzzy_distance: int = 0):
+        log.info("Init Chroma: path=%s collection=%s model=%s cache_dir=%s", path, collection, model_name, cache_dir)
         self.client = chromadb.PersistentClient(path=path)
-        self.embed = SentenceTransformerEmbeddingFunction(model_name=model_name)
+        self.cache = EmbeddingCache(model_name, cache_dir, maxsize=cache_size)
+        self.embed = CachedEmbeddingFunction(
+            SentenceTransformerEmbeddingFunction(model_name=model_name),
+            self.cache, batch_size=embed_batch, fuzzy_distance=fuzzy_distance,
+        )
+        self.upsert_batch = upsert_batch
         self.col = self.client.get_or_create_collection(
             name=collection,
             embedding_function=self.embed,
@@ -19,11 +181,20 @@ class ChromaRAG:
 
     def upsert(self, ids, documents, metadatas):
         n = len(ids)
-        self.col.upsert(ids=ids, documents=documents, metadatas=metadatas)
-        log.info(f"Upserted {n} items")
+        for i in range(0, n, self.upsert_batch):
+            j = i + self.upsert_batch
+            self.col.upsert(ids=ids[i:j], documents=documents[i:j], metadatas=metadatas[i:j])
+        log.info("Upserted %d items", n)
+
+    def get_by_path(self, json_path: str) -> dict | None:
+        """Doc ingested from `json_path`, via the `path_h` metadata filter."""
+        res = self.col.get(where={"path_h": path_hash(json_path)}, limit=1)
+        if not res["ids"]:
+            return None
+        return {"id": res["ids"][0], "document": res["documents"][0], "metadata": res["metadatas"][0]}
 
     def query(self, q: str, n_results: int = 20, where: dict | None = None):
-        log.debug(f"Query q='{q[:80]}...' n_results={n_results} where={where}")
+        log.debug("Query q='%.80s...' n_results=%d where=%s", q, n_results, where)
         res = self.col.query(query_texts=[q], n_results=n_results, where=where or {})
         out = []
         for i, _id in enumerate(res["ids"][0]):
@@ -33,6 +204,5 @@ class ChromaRAG:
                 "metadata": res["metadatas"][0][i],
                 "distance": res.get("distances", [[None]])[0][i],
             })
-        log.debug(f"Query returned {len(out)} hits")
+        log.debug("Query returned %d hits", len(out))
         return out
-
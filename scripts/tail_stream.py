@@ -38,17 +38,10 @@ async def main():
             for _stream, messages in res:
                 for msg_id, kv in messages:
                     last_id = msg_id
+                    # producers already write compact JSON: show it as-is (truncated
+                    # below) rather than parsing and re-serializing every message
                     out = kv.get("json")
-                    if out:
-                        # pretty-print JSON (truncate if enormous)
-                        try:
-                            parsed = json.loads(out)
-                            blob = json.dumps(parsed, ensure_ascii=False)
-                        except Exception:
-                            blob = out
-                    else:
-                        # raw key/value fallback
-                        blob = json.dumps(kv, ensure_ascii=False)
+                    blob = out if out else json.dumps(kv, ensure_ascii=False)  # raw key/value fallback
                     if len(blob) > 1200:
                         blob = blob[:1200] + " …[truncated]"
                     log.info(f"{args.stream}@{msg_id} :: {blob}")
@@ -5,12 +5,8 @@ import argparse, json, sys, hashlib
 from pathlib import Path
 
 def sha256(p: Path) -> str:
-    h = hashlib.sha256()
     with p.open("rb") as f:
-        for chunk in iter(lambda: f.read(1024 * 1024), b""):
-            if not chunk: break
-            h.update(chunk)
-    return h.digest().hex()
+        return hashlib.file_digest(f, "sha256").hexdigest()
 
 def main():
     ap = argparse.ArgumentParser(description="Verify manifest hashes for a single landing directory.")
@@ -15,7 +15,7 @@ import numpy as np
 import uvicorn
 import yaml
 from fastapi import FastAPI, Query
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 from common.logging import get_logger
 
@@ -298,6 +298,14 @@ def refresh() -> Dict[str, Any]:
 class SearchOut(BaseModel):
     results: List[Dict[str, Any]]
 
+class SearchReq(BaseModel):
+    q: str
+    cameras: Optional[List[str]] = None
+    start: Optional[float] = None
+    end: Optional[float] = None
+    top_k: int = Field(10, ge=1, le=100)
+    strict: bool = False
+
 def _query_dense(q: str, k: int) -> List[str]:
     if not IDX.exists() or not IDS.exists():
         return []
@@ -319,6 +327,10 @@ def _fetch_metadata(ids: List[str]) -> List[Dict[str, Any]]:
 # ---------------------------------------------------------------------
 # HTTP endpoints
 # ---------------------------------------------------------------------
+@app.get("/healthz")
+def http_healthz():
+    return {"ok": True}
+
 @app.get("/rag/rebuild")
 def http_rebuild():
     t0 = time.time()
@@ -343,12 +355,21 @@ def http_search(
     strict: bool = Query(False, description="if true, apply keyword filter on text fields"),
 ):
     log.info("search q='%s' k=%d cameras=%s strict=%s", q, k, cameras, strict)
+    return _search(q, start, end, set(cameras.split(",")) if cameras else None, k, strict)
+
+@app.post("/rag/search", response_model=SearchOut)
+def http_search_json(req: SearchReq):
+    """Same search as GET, with a JSON body (camera list, float bounds)."""
+    log.info("search q='%s' k=%d cameras=%s strict=%s", req.q, req.top_k, req.cameras, req.strict)
+    return _search(req.q, req.start, req.end, set(req.cameras) if req.cameras else None, req.top_k, req.strict)
+
+def _search(q: str, start: Optional[float], end: Optional[float], cams: Optional[set],
+            k: int, strict: bool) -> Dict[str, Any]:
     cand_ids = _query_dense(q, k)
     if not cand_ids:
         return {"results": []}
 
     meta = _fetch_metadata(cand_ids)
-    cams = set(cameras.split(",")) if cameras else None
 
     tokens = [t.lower() for t in q.split() if t.strip()]
 
@@ -365,11 +386,16 @@ def http_search(
         blob = " ".join(text_fields).lower()
         return any(tok in blob for tok in tokens)
 
+    # whole epoch seconds on both sides: stored ts may be a string, bounds floats
+    lo = int(start) if start is not None else None
+    hi = int(end) if end is not None else None
+
     out: List[Dict[str, Any]] = []
     for r in meta:
-        if start is not None and int(r["ts"]) < int(start):
+        ts = int(r["ts"])
+        if lo is not None and ts < lo:
             continue
-        if end is not None and int(r["ts"]) > int(end):
+        if hi is not None and ts > hi:
             continue
         if cams and r["camera_id"] not in cams:
             continue
@@ -1,8 +1,14 @@
 # server-vision-pipeline/services/indexer_stub/main.py
 from __future__ import annotations
 import argparse, json, os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
-from datetime import datetime
+from typing import Optional
+
+import orjson
+
+from common.index_doc import build_index_doc, utc_now_iso
 
 def load_json(p: Path):
     try:
@@ -10,68 +16,46 @@ def load_json(p: Path):
     except Exception:
         return None
 
-def flatten_record(root: Path, manifest: dict) -> dict:
-    d = Path(manifest["ingest"]["dir"]) if "ingest" in manifest else root
-    desc = load_json(d / "description.json") or {}
-    dets = load_json(d / "detections.json") or {}
-
-    # build a flat doc for indexing / NDJSON export
-    return {
-        "frame_id": manifest.get("frame_id"),
-        "camera_id": manifest.get("camera_id"),
-        "ts": manifest.get("ts"),
-        "scene": manifest.get("scene"),
-        "person_present": manifest.get("person_present"),
-        "pet_present": manifest.get("pet_present"),
-        "vehicles_present": manifest.get("vehicles_present"),
-        "activities": manifest.get("activities", []),
-
-        # file info
-        "ingest_dir": str(d),
-        "files": {
-            "frame": str(d / "frame.jpg"),
-            "tagged": str(d / "tagged.jpg"),
-            "detections": str(d / "detections.json"),
-            "description": str(d / "description.json"),
-        },
-        "hashes": manifest.get("hashes", {}),
-        "saved_bytes": manifest.get("saved_bytes", {}),
-
-        # embed-friendly text fields
-        "objects": [o.get("label") for o in dets.get("objects", []) if isinstance(o, dict)],
-        "people": [p.get("description") for p in (desc.get("people") or []) if isinstance(p, dict)],
-        "pets": [p.get("description") for p in (desc.get("pets") or []) if isinstance(p, dict)],
-        "vehicles": [v.get("description") for v in (desc.get("vehicles") or []) if isinstance(v, dict)],
-        "scene_text": json.dumps({
-            "scene": desc.get("scene"),
-            "objects": desc.get("objects", []),
-            "activities": desc.get("activities", []),
-        }, ensure_ascii=False),
-        "indexed_at": datetime.utcnow().isoformat() + "Z",
-    }
+def _flatten_to_line(mpath: Path, indexed_at: Optional[str] = None) -> Optional[bytes]:
+    """Load one manifest and return its NDJSON line (None if unreadable)."""
+    man = load_json(mpath)
+    if not man:
+        return None
+    if "ingest" not in man:
+        # pre-ingest_api bundles: the manifest's own folder is the landing dir
+        man["ingest"] = {"dir": str(mpath.parent)}
+    return orjson.dumps(build_index_doc(man, indexed_at=indexed_at), option=orjson.OPT_APPEND_NEWLINE)
 
 def walk_manifests(landing_root: Path):
-    for mp in landing_root.rglob("manifest.json"):
-        yield mp
+    # os.scandir reuses dirent types, avoiding a stat + Path object per entry
+    stack = [str(landing_root)]
+    while stack:
+        with os.scandir(stack.pop()) as it:
+            for e in it:
+                if e.is_dir(follow_symlinks=False):
+                    stack.append(e.path)
+                elif e.name == "manifest.json":
+                    yield Path(e.path)
 
 def main():
         ap = argparse.ArgumentParser(description="Build a flat NDJSON index from landing manifests.")
         ap.add_argument("--landing", default="data/landing", help="Root of landing tree")
         ap.add_argument("--out", default="data/index/frames.ndjson", help="Output NDJSON file")
+        ap.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
         args = ap.parse_args()
 
         landing = Path(args.landing).resolve()
         out = Path(args.out).resolve()
         out.parent.mkdir(parents=True, exist_ok=True)
 
+        # manifests are parsed/flattened in worker processes; results come back in order
+        flatten = partial(_flatten_to_line, indexed_at=utc_now_iso())
         count = 0
-        with out.open("w", encoding="utf-8") as fh:
-            for mpath in walk_manifests(landing):
-                man = load_json(mpath)
-                if not man:
+        with out.open("wb") as fh, ProcessPoolExecutor(max_workers=args.workers) as ex:
+            for line in ex.map(flatten, walk_manifests(landing), chunksize=64):
+                if line is None:
                     continue
-                doc = flatten_record(landing, man)
-                fh.write(json.dumps(doc, ensure_ascii=False) + "\n")
+                fh.write(line)
                 count += 1
 
         print(f"Wrote {count} records → {out}")
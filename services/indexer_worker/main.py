@@ -1,14 +1,15 @@
 # server-vision-pipeline/services/indexer_worker/main.py
 from __future__ import annotations
 
-import asyncio, json, os
+import asyncio, os
 from pathlib import Path
-from typing import Dict, Any, Optional
-from datetime import datetime
+from typing import Dict, Any, BinaryIO, List, Optional, TextIO
 
+import orjson
 import yaml
-from redis import asyncio as aioredis
 
+from common import redis_client
+from common.index_doc import build_index_doc, utc_now_iso
 from common.logging import get_logger  # uses your rotating file+console logger
 
 # --------------------------- Config & logging ---------------------------
@@ -25,7 +26,8 @@ REDIS_URL   = idx_rt.get("redis_url", rt.get("redis_url", "redis://127.0.0.1:637
 STREAM_IN   = idx_rt.get("stream_in", "frames.ingested")
 GROUP       = idx_rt.get("group", "indexer-worker")
 CONSUMER    = idx_rt.get("consumer", "ix-01")
-BATCH_SIZE  = int(idx_rt.get("batch_size", 32))
+BATCH_SIZE  = int(idx_rt.get("batch_size", 512))
+MAX_INFLIGHT_BYTES = int(idx_rt.get("max_inflight_bytes", 64 * 1024 * 1024))  # cap on buffered NDJSON per batch
 BLOCK_MS    = int(idx_rt.get("block_ms", 5000))
 MIN_IDLE_MS = int(idx_rt.get("min_idle_ms", 5000))
 DRAIN_HIST  = bool(idx_rt.get("drain_history", True))
@@ -45,90 +47,29 @@ SEEN_PATH.parent.mkdir(parents=True, exist_ok=True)
 
 # --------------------------- Utilities ---------------------------
 
-def _load_json(path: Path) -> Optional[dict]:
-    try:
-        return json.loads(path.read_text(encoding="utf-8"))
-    except Exception:
-        return None
-
-def _build_index_doc(man: Dict[str, Any]) -> Dict[str, Any]:
-    """
-    Build a flat, index-friendly record combining manifest + optional files
-    (description.json, detections.json) found in the landing directory.
-    """
-    ingest = man.get("ingest", {}) or {}
-    d = Path(ingest.get("dir", "")) if "dir" in ingest else None
-
-    desc = {}
-    dets = {}
-    if ENRICH_FROM_FILES and d and d.exists():
-        desc = _load_json(d / "description.json") or {}
-        dets = _load_json(d / "detections.json") or {}
-
-    # flatten a few helpful fields
-    rec = {
-        "frame_id": man.get("frame_id"),
-        "camera_id": man.get("camera_id"),
-        "ts": man.get("ts"),
-        "scene": man.get("scene"),
-        "person_present": man.get("person_present"),
-        "pet_present": man.get("pet_present"),
-        "vehicles_present": man.get("vehicles_present"),
-        "activities": man.get("activities", []),
-        "ingest_dir": str(d) if d else None,
-        "files": {
-            "frame": str(d / "frame.jpg") if d else None,
-            "tagged": str(d / "tagged.jpg") if d else None,
-            "detections": str(d / "detections.json") if d else None,
-            "description": str(d / "description.json") if d else None,
-        },
-        "hashes": man.get("hashes", {}),
-        "saved_bytes": man.get("saved_bytes", {}),
-        "objects": [o.get("label") for o in (dets.get("objects") or []) if isinstance(o, dict)],
-        "people": [p.get("description") for p in (desc.get("people") or []) if isinstance(p, dict)],
-        "pets": [p.get("description") for p in (desc.get("pets") or []) if isinstance(p, dict)],
-        "vehicles": [v.get("description") for v in (desc.get("vehicles") or []) if isinstance(v, dict)],
-        "scene_text": json.dumps({
-            "scene": (desc.get("scene")),
-            "objects": (desc.get("objects") or []),
-            "activities": (desc.get("activities") or []),
-        }, ensure_ascii=False),
-        "indexed_at": datetime.utcnow().isoformat() + "Z",
-    }
-    # drop Nones for cleanliness
-    return {k: v for k, v in rec.items() if v is not None}
-
-def _append_ndjson(doc: Dict[str, Any]) -> None:
-    with OUT.PATH.open("a", encoding="utf-8") as fh:
-        fh.write(json.dumps(doc, ensure_ascii=False) + "\n")
-
 def _load_seen_ids() -> set[str]:
     if not SEEN_PATH.exists():
         return set()
-    out = set()
-    with SEEN_PATH.open("r", encoding="utf-8") as fh:
-        for line in fh:
-            s = line.strip()
-            if s:
-                out.add(s)
-    return out
-
-def _append_seen_id(fid: str) -> None:
-    with SEEN_PATH.open("a", encoding="utf-8") as fh:
-        fh.write(f"{fid}\n")
-
-def _normalize_payload(kv: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    # one read + split; frame_ids never contain whitespace
+    return set(SEEN_PATH.read_text(encoding="utf-8").split())
+
+def _normalize_payload(kv: Dict[bytes, bytes]) -> Optional[Dict[str, Any]]:
     """
     frames.ingested is expected to be {"json": "<enriched manifest json>"}.
+    The client runs with decode_responses=False, so the raw bytes go
+    straight to orjson without an intermediate str decode.
     """
-    raw = kv.get("json")
+    raw = kv.get(b"json")
     if not raw:
         return None
     try:
-        return json.loads(raw)
+        return orjson.loads(raw)
     except Exception:
         return None
 
+def _s(v: Any) -> Any:
+    return v.decode("utf-8", errors="replace") if isinstance(v, bytes) else v
+
 # --------------------------- Redis group helpers ---------------------------
 
 async def ensure_group(r):
@@ -141,19 +82,84 @@ async def ensure_group(r):
         else:
             raise
 
-async def dlq(r, msg_id: str, kv: Dict[str, Any], error: str):
-    try:
-        await r.xadd(
-            DLQ_STREAM,
-            {"json": json.dumps({"source": STREAM_IN, "id": msg_id, "error": error, "kv": kv}, ensure_ascii=False)},
-            maxlen=20000, approximate=True
-        )
-    except Exception as e:
-        log.warning(f"[DLQ] failed to write DLQ: {e}")
+def _dlq_fields(msg_id: bytes, kv: Dict[bytes, bytes], error: str) -> Dict[str, bytes]:
+    kv_s = {_s(k): _s(v) for k, v in kv.items()}
+    return {"json": orjson.dumps({"source": STREAM_IN, "id": _s(msg_id), "error": error, "kv": kv_s})}
+
+# --------------------------- Batch processing ---------------------------
+
+async def index_messages(r, messages, seen: set[str], out_fh: BinaryIO, seen_fh: TextIO, phase: str):
+    """
+    Index one XREADGROUP/XAUTOCLAIM batch. NDJSON lines and frame_ids are
+    buffered and written with a single write + flush per batch; messages are
+    only XACKed after their records have been flushed. DLQ writes and XACKs
+    go out in one pipelined round-trip per batch.
+    """
+    lines: List[bytes] = []
+    new_ids: List[str] = []
+    acks: List[bytes] = []
+    dead: List[Dict[str, bytes]] = []
+    buffered = 0
+    now_iso = utc_now_iso()  # one indexed_at stamp per batch
+
+    def flush():
+        nonlocal buffered
+        if lines:
+            out_fh.write(b"".join(lines))
+            out_fh.flush()
+            lines.clear()
+        if new_ids:
+            seen_fh.write("".join(new_ids))
+            seen_fh.flush()
+            new_ids.clear()
+        buffered = 0
+
+    for msg_id, kv in messages:
+        try:
+            man = _normalize_payload(kv)
+            if not man:
+                dead.append(_dlq_fields(msg_id, kv, "schema_mismatch"))
+                acks.append(msg_id)
+                continue
+            fid = str(man.get("frame_id", "")).strip()
+            if fid and fid in seen:
+                log.debug(f"[skip] already indexed frame={fid}")
+                acks.append(msg_id)
+                continue
+            doc = build_index_doc(man, enrich_files=ENRICH_FROM_FILES, indexed_at=now_iso)
+            line = orjson.dumps(doc, option=orjson.OPT_APPEND_NEWLINE)
+            lines.append(line)
+            buffered += len(line)
+            if fid:
+                new_ids.append(f"{fid}\n")
+                seen.add(fid)
+            log.info(f"[indexed:{phase[0].upper()}] frame={fid or 'unknown'}")
+            acks.append(msg_id)
+        except Exception as e:
+            log.error(f"[{phase}] error: {e}")
+            dead.append(_dlq_fields(msg_id, kv, f"exception:{e}"))
+            acks.append(msg_id)
+        if buffered >= MAX_INFLIGHT_BYTES:
+            flush()
+
+    flush()
+    if not acks:
+        return
+
+    async with r.pipeline(transaction=False) as pipe:
+        for fields in dead:
+            pipe.xadd(DLQ_STREAM, fields, maxlen=20000, approximate=True)
+        pipe.xack(STREAM_IN, GROUP, *acks)
+        results = await pipe.execute(raise_on_error=False)
+    for res in results[:len(dead)]:
+        if isinstance(res, Exception):
+            log.warning(f"[DLQ] failed to write DLQ: {res}")
+    if isinstance(results[-1], Exception):
+        log.error(f"[{phase}] XACK failed for {len(acks)} message(s): {results[-1]}")
 
 # --------------------------- Phases ---------------------------
 
-async def drain_history(r, seen: set[str]):
+async def drain_history(r, seen: set[str], out_fh: BinaryIO, seen_fh: TextIO):
     if not DRAIN_HIST:
         log.info("Phase 1 skipped (drain_history=false)")
         return
@@ -165,35 +171,11 @@ async def drain_history(r, seen: set[str]):
         total = 0
         for _stream, messages in resp:
             total += len(messages)
-            for msg_id, kv in messages:
-                try:
-                    man = _normalize_payload(kv)
-                    if not man:
-                        await dlq(r, msg_id, kv, "schema_mismatch")
-                        await r.xack(STREAM_IN, GROUP, msg_id)
-                        continue
-                    fid = str(man.get("frame_id", "")).strip()
-                    if fid and fid in seen:
-                        log.debug(f"[skip] already indexed frame={fid}")
-                        await r.xack(STREAM_IN, GROUP, msg_id)
-                        continue
-                    doc = _build_index_doc(man)
-                    # append to NDJSON
-                    with OUT_PATH.open("a", encoding="utf-8") as fh:
-                        fh.write(json.dumps(doc, ensure_ascii=False) + "\n")
-                    if fid:
-                        _append_seen_id(fid)
-                        seen.add(fid)
-                    log.info(f"[indexed:H] frame={fid or 'unknown'}")
-                    await r.xack(STREAM_IN, GROUP, msg_id)
-                except Exception as e:
-                    log.error(f"[history] error: {e}")
-                    await dlq(r, msg_id, kv, f"exception:{e}")
-                    await r.xack(STREAM_IN, GROUP, msg_id)
+            await index_messages(r, messages, seen, out_fh, seen_fh, "history")
         if total == 0:
             break
 
-async def recover_pending(r, seen: set[str]):
+async def recover_pending(r, seen: set[str], out_fh: BinaryIO, seen_fh: TextIO):
     log.info(f"Phase 2: recovering stale pending (min_idle_ms={MIN_IDLE_MS})…")
     cursor = "0-0"
     while True:
@@ -219,78 +201,35 @@ async def recover_pending(r, seen: set[str]):
             cursor = next_cursor
             continue
 
-        for msg_id, kv in claimed:
-            try:
-                man = _normalize_payload(kv)
-                if not man:
-                    await dlq(r, msg_id, kv, "schema_mismatch")
-                    await r.xack(STREAM_IN, GROUP, msg_id)
-                    continue
-                fid = str(man.get("frame_id", "")).strip()
-                if fid and fid in seen:
-                    log.debug(f"[skip] already indexed frame={fid}")
-                    await r.xack(STREAM_IN, GROUP, msg_id)
-                    continue
-                doc = _build_index_doc(man)
-                with OUT_PATH.open("a", encoding="utf-8") as fh:
-                    fh.write(json.dumps(doc, ensure_ascii=False) + "\n")
-                if fid:
-                    _append_seen_id(fid)
-                    seen.add(fid)
-                log.info(f"[indexed:P] frame={fid or 'unknown'}")
-                await r.xack(STREAM_IN, GROUP, msg_id)
-            except Exception as e:
-                log.error(f"[pending] error: {e}")
-                await dlq(r, msg_id, kv, f"exception:{e}")
-                await r.xack(STREAM_IN, GROUP, msg_id)
+        await index_messages(r, claimed, seen, out_fh, seen_fh, "pending")
 
-async def live_loop(r, seen: set[str]):
+async def live_loop(r, seen: set[str], out_fh: BinaryIO, seen_fh: TextIO):
     log.info("Phase 3: live consumption (ID='>')…")
     while True:
         resp = await r.xreadgroup(GROUP, CONSUMER, streams={STREAM_IN: ">"}, count=BATCH_SIZE, block=BLOCK_MS)
         if not resp:
             continue
         for _stream, messages in resp:
-            for msg_id, kv in messages:
-                try:
-                    man = _normalize_payload(kv)
-                    if not man:
-                        await dlq(r, msg_id, kv, "schema_mismatch")
-                        await r.xack(STREAM_IN, GROUP, msg_id)
-                        continue
-                    fid = str(man.get("frame_id", "")).strip()
-                    if fid and fid in seen:
-                        log.debug(f"[skip] already indexed frame={fid}")
-                        await r.xack(STREAM_IN, GROUP, msg_id)
-                        continue
-                    doc = _build_index_doc(man)
-                    with OUT_PATH.open("a", encoding="utf-8") as fh:
-                        fh.write(json.dumps(doc, ensure_ascii=False) + "\n")
-                    if fid:
-                        _append_seen_id(fid)
-                        seen.add(fid)
-                    log.info(f"[indexed:L] frame={fid or 'unknown'}")
-                    await r.xack(STREAM_IN, GROUP, msg_id)
-                except Exception as e:
-                    log.error(f"[live] error: {e}")
-                    await dlq(r, msg_id, kv, f"exception:{e}")
-                    await r.xack(STREAM_IN, GROUP, msg_id)
+            await index_messages(r, messages, seen, out_fh, seen_fh, "live")
 
 # --------------------------- Main ---------------------------
 
 async def main():
     log.info(f"indexer_worker starting… redis={REDIS_URL} stream={STREAM_IN} group={GROUP} out={OUT_PATH}")
-    r = aioredis.from_url(REDIS_URL, decode_responses=True)
+    r = redis_client.from_url(REDIS_URL, decode_responses=False)
     await ensure_group(r)
 
     # Build in-memory set of already-indexed frame_ids for idempotency
     seen = _load_seen_ids()
     log.info(f"Loaded {len(seen)} previously indexed frame_ids")
 
-    if DRAIN_HIST:
-        await drain_history(r, seen)
-    await recover_pending(r, seen)
-    await live_loop(r, seen)
+    # Long-lived append handles; each batch is written + flushed once before XACK
+    with OUT_PATH.open("ab", buffering=1 << 20) as out_fh, \
+         SEEN_PATH.open("a", encoding="utf-8", buffering=1 << 16) as seen_fh:
+        if DRAIN_HIST:
+            await drain_history(r, seen, out_fh, seen_fh)
+        await recover_pending(r, seen, out_fh, seen_fh)
+        await live_loop(r, seen, out_fh, seen_fh)
 
 if __name__ == "__main__":
     try:
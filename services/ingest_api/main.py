@@ -1,26 +1,30 @@
 # server-vision-pipeline/services/ingest_api/main.py
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import json
 import os
 from datetime import datetime
 from pathlib import Path
-from typing import Optional, Dict
+from typing import Optional, Dict, Tuple
 
+import aiofiles
+import orjson
 import uvicorn
 import yaml
 from fastapi import FastAPI, UploadFile, File, Form
 from fastapi.responses import JSONResponse
+from starlette.formparsers import MultiPartParser
 
+from common import redis_client
 from common.logging import get_logger  # uses your rotating file+console logger
 
-from redis import asyncio as aioredis
-
 _redis = None
 async def get_redis():
     global _redis
     if _redis is None:
-        _redis = aioredis.from_url(REDIS_URL, decode_responses=True)
+        _redis = redis_client.from_url(REDIS_URL, decode_responses=True)
     return _redis
 
 
@@ -42,6 +46,9 @@ REDIS_URL: str = rt.get("redis_url", "redis://127.0.0.1:6379/0")  # used by scri
 INGEST_BASE: Path = Path(rt.get("ingest_base", str(ROOT / "data" / "landing")))
 LOG_LEVEL: str = rt.get("log_level", "INFO")
 LOG_DIR: str = rt.get("log_dir", "logs")
+# Uploads up to this size stay in memory instead of spooling to /tmp first
+UPLOAD_SPOOL_BYTES: int = int(rt.get("upload_spool_mb", 16)) * 1024 * 1024
+MultiPartParser.spool_max_size = UPLOAD_SPOOL_BYTES
 
 # ensure log level is picked up by our logger helper
 os.environ["LOG_LEVEL"] = LOG_LEVEL
@@ -56,38 +63,24 @@ INGEST_BASE.mkdir(parents=True, exist_ok=True)
 app = FastAPI(title="server-vision-pipeline :: Ingest API")
 
 
-def _save_file(dst: Path, file: Optional[UploadFile]) -> int:
+async def _save_file(dst: Path, file: Optional[UploadFile]) -> Tuple[int, str]:
     """
-    Save uploaded file to `dst`. Returns bytes written. If `file` is None,
-    returns 0 and does nothing.
+    Save uploaded file to `dst`, hashing it while it is written.
+    Returns (bytes written, SHA-256 hex digest). If `file` is None,
+    returns (0, "") and does nothing. Reads and writes are async so a
+    large upload doesn't block the event loop.
     """
     if not file:
-        return 0
+        return 0, ""
     dst.parent.mkdir(parents=True, exist_ok=True)
     written = 0
-    with dst.open("wb") as f:
-        for chunk in iter(lambda: file.file.read(1024 * 1024), b""):
-            if not chunk:
-                break
-            f.write(chunk)
-            written += len(chunk)
-    return written
-
-
-def _sha256_of(path: Path) -> str:
-    """
-    Compute SHA-256 of a file if it exists; return empty string otherwise.
-    """
-    if not path.exists() or not path.is_file():
-        return ""
-    import hashlib
     h = hashlib.sha256()
-    with path.open("rb") as f:
-        for chunk in iter(lambda: f.read(1024 * 1024), b""):
-            if not chunk:
-                break
+    async with aiofiles.open(dst, "wb") as f:
+        while chunk := await file.read(1024 * 1024):
             h.update(chunk)
-    return h.hexdigest()
+            await f.write(chunk)
+            written += len(chunk)
+    return written, h.hexdigest()
 
 
 @app.post("/api/ingest/frame")
@@ -128,25 +121,19 @@ async def ingest_frame(
     out_dir = INGEST_BASE / dt.strftime("%Y/%m/%d") / camera_id / frame_id
     out_dir.mkdir(parents=True, exist_ok=True)
 
-    # Save files first so we can compute sizes/hashes for manifest enrichment
-    bytes_written = {
-        "frame": _save_file(out_dir / "frame.jpg", frame),
-        "tagged": _save_file(out_dir / "tagged.jpg", tagged),
-        "detections": _save_file(out_dir / "detections.json", detections),
-        "description": _save_file(out_dir / "description.json", description),
-    }
-
-    # Compute hashes for saved files
-    hashes = {
-        "frame_sha256": _sha256_of(out_dir / "frame.jpg"),
-        "tagged_sha256": _sha256_of(out_dir / "tagged.json"),  # note: file name is .jpg, fix below
-        "detections_sha256": _sha256_of(out_dir / "detections.json"),
-        "description_sha256": _sha256_of(out_dir / "desciption.json"),  # fix below
-    }
-
-    # FIX typos in file names
-    hashes["tagged_sha256"] = _sha256_of(out_dir / "tagged.jpg")
-    hashes["description_sha256"] = _sha256_of(out_dir / "description.json")
+    # Save files first; sizes/hashes are computed in-stream for manifest enrichment
+    # (independent files, so they are written concurrently)
+    names = ("frame", "tagged", "detections", "description")
+    results = await asyncio.gather(
+        _save_file(out_dir / "frame.jpg", frame),
+        _save_file(out_dir / "tagged.jpg", tagged),
+        _save_file(out_dir / "detections.json", detections),
+        _save_file(out_dir / "description.json", description),
+    )
+    saved = dict(zip(names, results))
+    bytes_written = {name: n for name, (n, _digest) in saved.items()}
+    # omitted/empty parts get no hash, matching a missing file
+    hashes = {f"{name}_sha256": digest if n else "" for name, (n, digest) in saved.items()}
 
     # Merge a richer manifest for downstream indexing
     final_manifest = {
@@ -176,7 +163,7 @@ async def ingest_frame(
         r = await get_redis()
         await r.xadd(
             "frames.ingested",
-            {"json": json.dumps(final_manifest, ensure_ascii=False)},
+            {"json": orjson.dumps(final_manifest)},
             maxlen=50000,  # optional cap
             approximate=True
         )
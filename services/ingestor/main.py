@@ -1,46 +1,197 @@
+# server-vision-pipeline/services/ingestor/main.py
+from __future__ import annotations
+import asyncio, os, sqlite3
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+import orjson
+import yaml
+from watchfiles import Change, awatch
+
+from rag_store.chroma_store import ChromaRAG, path_hash
 from common.logging import get_logger
 log = get_logger("ingestor")
 
-def ingest_file(rag: ChromaRAG, json_path: Path):
+READ_CONCURRENCY = 32  # concurrent JSON file reads per batch
+
+def prepare_doc(json_path: Path) -> Optional[Tuple[str, str, dict]]:
+    """Parse one description JSON into (frame_id, doc, meta); None if unusable."""
     try:
-        data = json.loads(json_path.read_text(encoding="utf-8"))
+        data = orjson.loads(json_path.read_bytes())
         frame_id = (data.get("_meta") or {}).get("frame_id") or data.get("frame_id")
         if not frame_id:
-            log.warning(f"Skip (no frame_id): {json_path}")
-            return False
+            log.warning("Skip (no frame_id): %s", json_path)
+            return None
 
         # ensure json_path recorded in metadata for later /rag/get
         meta = extract_meta(data)
         meta.setdefault("json_path", str(json_path.resolve()))
+        meta["path_h"] = path_hash(meta["json_path"])
 
-        doc = build_doc_string(data)
-        rag.upsert(ids=[frame_id], documents=[doc], metadatas=[meta])
-        log.info(f"Ingested frame_id={frame_id} cam={meta.get('camera_id')} ts={meta.get('ts')}")
-        return True
+        return frame_id, build_doc_string(data), meta
+    except Exception as e:
+        log.error("Ingest error %s: %s", json_path, e)
+        return None
+
+def upsert_docs(rag: ChromaRAG, docs: List[Tuple[str, str, dict]]) -> int:
+    """One rag.upsert for a batch of prepared docs; returns how many were written."""
+    # Chroma rejects duplicate ids within a single upsert; last write wins
+    by_id = {fid: (doc, meta) for fid, doc, meta in docs}
+    if not by_id:
+        return 0
+    ids = list(by_id)
+    try:
+        rag.upsert(ids=ids, documents=[d for d, _ in by_id.values()], metadatas=[m for _, m in by_id.values()])
     except Exception as e:
-        log.error(f"Ingest error {json_path}: {e}")
-        return False
+        log.error("Upsert error (%d docs): %s", len(ids), e)
+        return 0
+    return len(ids)
+
+class SeenState:
+    """
+    (path, mtime, size) of files already upserted, persisted in SQLite so a
+    restart skips them with one primary-key lookup each instead of
+    re-parsing and re-embedding the whole watch tree. Paths are stored
+    resolved, so the scan's (possibly relative) paths and the watcher's
+    absolute ones share a key.
+    """
+
+    def __init__(self, db_path: str):
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.cx = sqlite3.connect(db_path, check_same_thread=False)
+        self.cx.execute("CREATE TABLE IF NOT EXISTS seen(path TEXT PRIMARY KEY, mtime REAL, size INTEGER)")
+        self.cx.commit()
+
+    def unseen(self, paths: Iterable[Path]) -> List[Tuple[str, float, int]]:
+        out = []
+        done = set()
+        for p in paths:
+            try:
+                p = p.resolve()
+                st = p.stat()
+            except OSError:
+                continue
+            if p in done:
+                continue
+            done.add(p)
+            key = (str(p), st.st_mtime, st.st_size)
+            if not self.cx.execute("SELECT 1 FROM seen WHERE path=? AND mtime=? AND size=?", key).fetchone():
+                out.append(key)
+        return out
+
+    def mark(self, keys: List[Tuple[str, float, int]]) -> None:
+        self.cx.executemany("INSERT OR REPLACE INTO seen VALUES (?,?,?)", keys)
+        self.cx.commit()
+
+def _flush(rag: ChromaRAG, state: SeenState, docs: List[Tuple[str, str, dict]], keys: List[Tuple[str, float, int]]) -> int:
+    n = upsert_docs(rag, docs)
+    if n:
+        state.mark(keys)
+    return n
 
-def main():
+async def ingest_paths(rag: ChromaRAG, paths: Iterable[Path], batch_size: int, state: SeenState) -> int:
+    """
+    Prepare docs for not-yet-seen `paths` and upsert them `batch_size` at a
+    time. File reads/parsing run in threads (at most READ_CONCURRENCY at
+    once) and the next batch is read while the previous one is still being
+    embedded + upserted. Files are recorded in `state` per successful batch.
+    """
+    todo = await asyncio.to_thread(state.unseen, list(paths))
+    sem = asyncio.Semaphore(READ_CONCURRENCY)
+
+    async def prep(key: Tuple[str, float, int]):
+        async with sem:
+            return key, await asyncio.to_thread(prepare_doc, Path(key[0]))
+
+    new = 0
+    inflight: Optional[asyncio.Task] = None
+    for i in range(0, len(todo), batch_size):
+        results = await asyncio.gather(*(prep(k) for k in todo[i:i + batch_size]))
+        keys = [k for k, doc in results if doc]
+        docs = [doc for _, doc in results if doc]
+        if inflight:
+            new += await inflight
+        inflight = asyncio.create_task(asyncio.to_thread(_flush, rag, state, docs, keys))
+    if inflight:
+        new += await inflight
+    return new
+
+def iter_json_batches(root: str, batch: int = 256):
+    """
+    Walk `root` with os.scandir and yield lists of up to `batch` .json path
+    strings as they are found, so a huge tree is processed incrementally
+    rather than materialized up front.
+    """
+    out: list[str] = []
+    stack = [root]
+    while stack:
+        try:
+            it = os.scandir(stack.pop())
+        except OSError as e:
+            log.warning("Scan error: %s", e)
+            continue
+        with it:
+            for e in it:
+                if e.is_dir(follow_symlinks=False):
+                    stack.append(e.path)
+                elif e.name.endswith(".json") and e.is_file(follow_symlinks=False):
+                    out.append(e.path)
+                    if len(out) >= batch:
+                        yield out
+                        out = []
+    if out:
+        yield out
+
+def _json_filter(change: Change, path: str) -> bool:
+    return change in (Change.added, Change.modified) and path.endswith(".json")
+
+async def main():
     cfg = yaml.safe_load(open("config/config.yaml","r"))
     rag_cfg = cfg["rag"]; ing_cfg = cfg["ingest"]
-    rag = ChromaRAG(rag_cfg["chroma_path"], rag_cfg["collection"], rag_cfg["embedding_model"])
+    rag = ChromaRAG(rag_cfg["chroma_path"], rag_cfg["collection"], rag_cfg["embedding_model"],
+                    cache_dir=rag_cfg.get("embed_cache_dir"),
+                    fuzzy_distance=int(rag_cfg.get("embed_fuzzy_distance", 0)))
 
     watch_dirs = ing_cfg.get("watch_dirs", [])
     pattern = ing_cfg.get("glob", "**/*.json")
-    interval = int(ing_cfg.get("scan_interval_sec", 10))
-
-    log.info(f"Watching {watch_dirs} pattern='{pattern}' interval={interval}s")
-    seen = set()
-    while True:
-        new = 0
-        for root in watch_dirs:
-            for p in Path(root).glob(pattern):
-                if p.suffix.lower() != ".json": continue
-                if p in seen: continue
-                if ingest_file(rag, p):
-                    seen.add(p); new += 1
+    batch_size = int(ing_cfg.get("batch_size", 64))
+    state = SeenState(ing_cfg.get("state_db", "data/vectors/ingest_state.sqlite"))
+
+    # Start watching BEFORE the catch-up scan so files written while it runs
+    # are not missed: events are buffered and handled after the scan, and
+    # SeenState drops anything both of them pick up.
+    events: "asyncio.Queue[Optional[set]]" = asyncio.Queue()
+
+    async def watch() -> None:
+        try:
+            async for changes in awatch(*watch_dirs, watch_filter=_json_filter, recursive=True):
+                await events.put(changes)
+        finally:
+            await events.put(None)
+
+    watcher = asyncio.create_task(watch())
+    await asyncio.sleep(0)  # awatch installs its watches on the task's first step
+
+    # one pass for files that landed while we were down
+    new = 0
+    for root in watch_dirs:
+        for batch in iter_json_batches(root):
+            paths = [p for p in map(Path, batch) if p.match(pattern)]
+            new += await ingest_paths(rag, paths, batch_size, state)
+    log.info("Initial scan ingested %d JSON(s)", new)
+
+    # then react to filesystem events (inotify/FSEvents) instead of rescanning
+    log.info("Watching %s pattern='%s'", watch_dirs, pattern)
+    while (changes := await events.get()) is not None:
+        # a write usually shows up as added+modified in the same batch
+        paths = sorted({Path(p) for _chg, p in changes if Path(p).match(pattern)})
+        new = await ingest_paths(rag, paths, batch_size, state)
         if new:
-            log.info(f"Ingested {new} new JSON(s) this cycle")
-        time.sleep(interval)
+            log.info("Ingested %d new JSON(s)", new)
+    await watcher  # surface the watcher's exception, if it died
 
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
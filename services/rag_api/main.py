@@ -3,13 +3,13 @@ log = get_logger("rag_api")
 
 @app.post("/rag/search")
 def rag_search(req: SearchReq):
-    log.info(f"/rag/search q='{req.q[:80]}...' cams={req.cameras} start={req.start} end={req.end} top_k={req.top_k}")
+    log.info("/rag/search q='%.80s...' cams=%s start=%s end=%s top_k=%s", req.q, req.cameras, req.start, req.end, req.top_k)
     ...
-    log.info(f"/rag/search → {len(results)} result(s)")
+    log.info("/rag/search → %d result(s)", len(results))
     return {"results": results}
 
 @app.post("/rag/get")
 def rag_get(req: GetReq):
-    log.info(f"/rag/get frame_id={req.frame_id}")
+    log.info("/rag/get frame_id=%s", req.frame_id)
     ...
 
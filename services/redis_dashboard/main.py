@@ -1,21 +1,21 @@
 # services/redis_dashboard/main.py
 from __future__ import annotations
-import os
+import asyncio, json, os, time
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Tuple
 
 import uvicorn
-import yaml
-from fastapi import FastAPI, Query
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi import FastAPI, Query, Request
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
 from redis import asyncio as aioredis
 
+from common.config import load_yaml
 from common.logging import get_logger
 
 # ----------------------- config & logging -----------------------
 ROOT = Path(__file__).resolve().parents[2]
 CFG_PATH = ROOT / "config" / "config.yaml"
-cfg: Dict[str, Any] = yaml.safe_load(CFG_PATH.read_text(encoding="utf-8"))
+cfg: Dict[str, Any] = load_yaml(CFG_PATH)
 
 rt = cfg.get("runtime", {}) or {}
 idx = (cfg.get("indexer") or {}).get("runtime", {}) or {}
@@ -62,17 +62,24 @@ async def get_redis() -> aioredis.Redis:
         redis = aioredis.from_url(REDIS_URL, decode_responses=True)
     return redis
 
-async def group_stats(r: aioredis.Redis, stream_name: str, group_name: str) -> Dict[str, Any]:
-    """Return lag/pending stats for one group; creates the group if missing."""
-    try:
-        await r.xgroup_create(stream_name, group_name, id="0-0", mkstream=True)
-    except Exception:
-        pass  # BUSYGROUP or stream already exists
+@app.on_event("startup")
+async def ensure_groups() -> None:
+    """Create tracked groups once, so /metrics never has to."""
+    r = await get_redis()
+    for spec in STREAMS:
+        try:
+            await r.xgroup_create(spec["stream"], spec["group"], id="0-0", mkstream=True)
+        except Exception:
+            pass  # BUSYGROUP or stream already exists
 
-    try:
-        groups = await r.xinfo_groups(stream_name)
-    except Exception as e:
-        return {"stream": stream_name, "group": group_name, "error": str(e)}
+# stream -> (monotonic ts, XLEN) for the lag fallback on older Redis
+_LEN_TTL_SEC = 0.5
+_stream_len: Dict[str, tuple[float, int]] = {}
+
+def group_stats(stream_name: str, group_name: str, groups: Any, length: int | None) -> Dict[str, Any]:
+    """Lag/pending stats for one group from its XINFO GROUPS reply (or the error it raised)."""
+    if isinstance(groups, Exception):
+        return {"stream": stream_name, "group": group_name, "error": str(groups)}
 
     info = next((g for g in groups if g.get("name") == group_name), None)
     if not info:
@@ -85,12 +92,7 @@ async def group_stats(r: aioredis.Redis, stream_name: str, group_name: str) -> D
 
     # Fallback lag if Redis version doesn't return 'lag'
     if lag is None:
-        try:
-            sinfo = await r.xinfo_stream(stream_name)
-            length = int(sinfo.get("length", 0))
-            lag = max(0, length - int(entries_read or 0))
-        except Exception:
-            lag = -1
+        lag = max(0, length - int(entries_read or 0)) if length is not None else -1
 
     return {
         "stream": stream_name,
@@ -102,32 +104,95 @@ async def group_stats(r: aioredis.Redis, stream_name: str, group_name: str) -> D
     }
 
 async def all_stats() -> List[Dict[str, Any]]:
+    """XINFO GROUPS for every tracked stream in one pipelined round-trip."""
     r = await get_redis()
-    out: List[Dict[str, Any]] = []
+    pipe = r.pipeline(transaction=False)
     for spec in STREAMS:
-        st = await group_stats(r, spec["stream"], spec["group"])
+        pipe.xinfo_groups(spec["stream"])
+    replies = await pipe.execute(raise_on_error=False)
+
+    # streams whose group reply has no 'lag' need XINFO STREAM; cached briefly
+    now = time.monotonic()
+    need = sorted({
+        spec["stream"] for spec, groups in zip(STREAMS, replies)
+        if not isinstance(groups, Exception)
+        and any(g.get("name") == spec["group"] and "lag" not in g for g in groups)
+        and now - _stream_len.get(spec["stream"], (0.0, 0))[0] >= _LEN_TTL_SEC
+    })
+    if need:
+        pipe = r.pipeline(transaction=False)
+        for stream in need:
+            pipe.xinfo_stream(stream)
+        for stream, sinfo in zip(need, await pipe.execute(raise_on_error=False)):
+            if isinstance(sinfo, Exception):
+                _stream_len.pop(stream, None)
+            else:
+                _stream_len[stream] = (now, int(sinfo.get("length", 0)))
+
+    out: List[Dict[str, Any]] = []
+    for spec, groups in zip(STREAMS, replies):
+        cached = _stream_len.get(spec["stream"])
+        st = group_stats(spec["stream"], spec["group"], groups, cached[1] if cached else None)
         st["label"] = spec["label"]
         out.append(st)
     return out
 
-def tail_last_lines(path: Path, max_lines: int = 200, max_bytes: int = 64_000) -> List[str]:
-    """Read last N lines from a file up to max_bytes; handle missing files gracefully."""
+def tail_last_lines(path: Path, max_lines: int = 200, max_bytes: int = 1_000_000, block: int = 4096) -> List[str]:
+    """
+    Read last N lines from a file by seeking back from EOF in `block`-sized
+    steps until enough newlines are buffered (never more than max_bytes);
+    handle missing files gracefully.
+    """
     try:
         if not path.exists() or not path.is_file():
             return [f"[{path.name}] (no file)"]
-        size = path.stat().st_size
         with path.open("rb") as f:
-            if size <= max_bytes:
-                data = f.read()
-            else:
-                f.seek(-max_bytes, os.SEEK_END)
-                data = f.read()
-        text = data.decode("utf-8", errors="replace")
-        lines = text.splitlines()
-        return lines[-max_lines:] if len(lines) > max_lines else lines
+            pos = f.seek(0, os.SEEK_END)
+            buf = b""
+            while pos and buf.count(b"\n") <= max_lines and len(buf) < max_bytes:
+                step = min(block, pos)
+                pos -= step
+                f.seek(pos)
+                buf = f.read(step) + buf
+        return [ln.decode("utf-8", errors="replace") for ln in buf.splitlines()[-max_lines:]]
     except Exception as e:
         return [f"[{path.name}] error: {e}"]
 
+# (st_dev, st_ino, byte offset) of a followed log file
+FilePos = Tuple[int, int, int]
+
+def end_pos(path: Path) -> FilePos:
+    """Position at the current end of `path` ((0, 0, 0) if it is missing)."""
+    try:
+        st = path.stat()
+    except OSError:
+        return (0, 0, 0)
+    return (st.st_dev, st.st_ino, st.st_size)
+
+def read_appended(path: Path, pos: FilePos, carry: bytes) -> Tuple[List[str], FilePos, bytes]:
+    """
+    Complete lines written to `path` since `pos`, the new position, and any
+    trailing partial line (carried into the next call). A file that was
+    replaced (rotated: new inode) or shrank (truncated) is re-read from the
+    start.
+    """
+    try:
+        f = path.open("rb")
+    except OSError:
+        return [], (0, 0, 0), b""
+    with f:
+        st = os.fstat(f.fileno())
+        dev, ino, offset = pos
+        if (st.st_dev, st.st_ino) != (dev, ino) or st.st_size < offset:
+            offset, carry = 0, b""
+        new_pos = (st.st_dev, st.st_ino, st.st_size)
+        if st.st_size == offset:
+            return [], new_pos, carry
+        f.seek(offset)
+        data = carry + f.read(st.st_size - offset)
+    *complete, rest = data.split(b"\n")
+    return [ln.decode("utf-8", errors="replace").rstrip("\r") for ln in complete], new_pos, rest
+
 # ----------------------- METRICS page -----------------------
 @app.get("/", response_class=HTMLResponse)
 async def home():
@@ -210,10 +275,24 @@ refresh();
 </body>
 </html>"""
 
+# every open tab polls /metrics; callers within the TTL share one Redis fetch
+_METRICS_TTL_SEC = 0.5
+_metrics_cache: Dict[str, Any] = {"ts": 0.0, "data": None}
+_metrics_lock = asyncio.Lock()
+
+async def cached_stats() -> List[Dict[str, Any]]:
+    if time.monotonic() - _metrics_cache["ts"] < _METRICS_TTL_SEC:
+        return _metrics_cache["data"]
+    async with _metrics_lock:
+        if time.monotonic() - _metrics_cache["ts"] >= _METRICS_TTL_SEC:
+            _metrics_cache["data"] = await all_stats()
+            _metrics_cache["ts"] = time.monotonic()
+        return _metrics_cache["data"]
+
 @app.get("/metrics", response_class=JSONResponse)
 async def metrics():
     try:
-        data = await all_stats()
+        data = await cached_stats()
         return JSONResponse(data)
     except Exception as e:
         log.error("metrics error: %s", e)
@@ -259,7 +338,7 @@ async def logs_page():
     <a href="/logs">Live Logs</a>
   </nav>
   <h1>Live Logs</h1>
-  <div class="meta">Log dir: <span class="dim">{LOG_DIR}</span> · Updating every 1000 ms</div>
+  <div class="meta">Log dir: <span class="dim">{LOG_DIR}</span> · Streaming (SSE)</div>
   <div class="grid">
     {service_cards}
   </div>
@@ -271,37 +350,72 @@ const panes = {{
   nana_reasoner:  document.getElementById('log_nana_reasoner'),
   camera_resolver:document.getElementById('log_camera_resolver'),
 }};
-async function tick() {{
-  try {{
-    const res = await fetch('/logz?lines=200');
-    const data = await res.json();
-    for (const k of Object.keys(panes)) {{
-      const lines = (data[k] || []).join('\\n') || '(no data)';
-      const el = panes[k];
-      const atBottom = (el.scrollTop + el.clientHeight + 10) >= el.scrollHeight;
-      el.textContent = lines;
-      if (atBottom) el.scrollTop = el.scrollHeight;
-    }}
-  }} catch (e) {{
-    console.error(e);
-  }}
+const MAX_LINES = 200;
+const buf = {{}};
+const es = new EventSource('/logs/stream?lines=' + MAX_LINES);
+for (const k of Object.keys(panes)) {{
+  buf[k] = [];
+  es.addEventListener(k, (ev) => {{
+    const msg = JSON.parse(ev.data);
+    buf[k] = (msg.reset ? msg.lines : buf[k].concat(msg.lines)).slice(-MAX_LINES);
+    const el = panes[k];
+    const atBottom = (el.scrollTop + el.clientHeight + 10) >= el.scrollHeight;
+    el.textContent = buf[k].join('\\n') || '(no data)';
+    if (atBottom) el.scrollTop = el.scrollHeight;
+  }});
 }}
-setInterval(tick, 1000);
-tick();
+es.onerror = (e) => console.error(e);  // EventSource reconnects on its own
 </script>
 </body>
 </html>"""
 
 @app.get("/logz", response_class=JSONResponse)
 async def log_feed(lines: int = Query(200, ge=10, le=2000)):
-    out: Dict[str, List[str]] = {}
-    for name, path in LOG_FILES.items():
-        out[name] = tail_last_lines(path, max_lines=lines)
+    # tail all files concurrently, off the event loop
+    tails = await asyncio.gather(*(asyncio.to_thread(tail_last_lines, path, lines) for path in LOG_FILES.values()))
+    out: Dict[str, List[str]] = dict(zip(LOG_FILES, tails))
     return JSONResponse(out)
 
+LOG_POLL_SEC = 1.0
+
+def _sse(name: str, payload: Dict[str, Any]) -> str:
+    return f"event: {name}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+@app.get("/logs/stream")
+async def log_stream(request: Request, lines: int = Query(200, ge=10, le=2000)):
+    """
+    Server-Sent Events: one `reset` snapshot per file on connect, then only
+    the lines appended since, tracked by per-connection (inode, byte offset) positions.
+    """
+    async def events():
+        paths = list(LOG_FILES.items())
+        tails = await asyncio.gather(*(asyncio.to_thread(tail_last_lines, p, lines) for _, p in paths))
+        offsets: Dict[str, FilePos] = {}
+        carry: Dict[str, bytes] = {}
+        for (name, path), tail in zip(paths, tails):
+            offsets[name] = end_pos(path)
+            carry[name] = b""
+            yield _sse(name, {"reset": True, "lines": tail})
+
+        while not await request.is_disconnected():
+            await asyncio.sleep(LOG_POLL_SEC)
+            news = await asyncio.gather(*(
+                asyncio.to_thread(read_appended, p, offsets[name], carry[name]) for name, p in paths
+            ))
+            for (name, _), (new_lines, offsets[name], carry[name]) in zip(paths, news):
+                if new_lines:
+                    yield _sse(name, {"reset": False, "lines": new_lines[-lines:]})
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
+
 # ----------------------- main -----------------------
 if __name__ == "__main__":
     log.info("Server Vision Pipeline Redis Dashboard starting on %s:%d (redis=%s)", DASH_HOST, DASH_PORT, REDIS_URL)
     uvicorn.run("services.redis_dashboard.main:app",
                 host=DASH_HOST, port=DASH_PORT,
+                loop="uvloop", http="httptools",  # both ship with uvicorn[standard]
+                # one worker by default: the rotating log file, ensure_groups
+                # and the stats TTL cache are all per process
+                workers=int(os.getenv("WEB_WORKERS", 1)),
                 reload=False, log_level=LOG_LEVEL.lower())
@@ -0,0 +1,153 @@
+# services/vision_reasoner/direct_plan.py
+from __future__ import annotations
+
+import re
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+# Plain DIRECT commands ("show me people yesterday from the street camera")
+# are planned locally from a fixed template; anything the patterns or the
+# registry lookup are not sure about falls through to the LLM.
+
+_SUBJECTS = {
+    "people": "person", "person": "person", "persons": "person",
+    "vehicle": "vehicle", "vehicles": "vehicle", "car": "vehicle", "cars": "vehicle",
+    "pet": "pet", "pets": "pet",
+    "คน": "person", "รถ": "vehicle", "สัตว์เลี้ยง": "pet",
+}
+
+_WHEN = {
+    "today": "today", "yesterday": "yesterday", "last night": "last_night",
+    "วันนี้": "today",
+    "เมื่อวาน": "yesterday", "เมื่อวานนี้": "yesterday",
+    "เมื่อคืน": "last_night", "เมื่อคืนนี้": "last_night",
+}
+
+_EN_HEAD = r"^\s*(?:please\s+)?(?:show|list|find)\s+(?:me\s+)?(?:all\s+)?(?:the\s+)?"
+_EN_SUBJ = r"(?P<subj>people|persons?|vehicles?|cars?|pets?)\s+(?:detected\s+|seen\s+)?"
+_EN_WHEN = r"(?P<when>yesterday|today|last\s+night)"
+_EN_PLACE = r"(?:from|at|in|on)\s+(?:the\s+)?(?P<place>.+?)"
+_EN_TAIL = r"\s*[.?!]?\s*$"
+
+_PATTERNS = (
+    # show me people yesterday from the street camera
+    re.compile(_EN_HEAD + _EN_SUBJ + _EN_WHEN + r"\s+" + _EN_PLACE + _EN_TAIL, re.IGNORECASE),
+    # show me people at the street camera yesterday
+    re.compile(_EN_HEAD + _EN_SUBJ + _EN_PLACE + r"\s+" + _EN_WHEN + _EN_TAIL, re.IGNORECASE),
+    # ขอดูคนเมื่อวานจากกล้อง street
+    re.compile(
+        r"^\s*(?:ขอ)?(?:ดู|แสดง|หา)\s*(?P<subj>คน|รถ|สัตว์เลี้ยง)\s*"
+        r"(?P<when>เมื่อวานนี้|เมื่อวาน|วันนี้|เมื่อคืนนี้|เมื่อคืน)\s*(?:จาก|ที่)\s*"
+        r"(?P<place>.+?)\s*(?:ครับ|ค่ะ|คะ|นะ)?\s*$"
+    ),
+)
+
+# stripped from the place phrase before the registry lookup
+_PLACE_NOISE = re.compile(r"(?:^|\s)(?:camera|cam|zone|area)s?$|^กล้อง\s*|\s*กล้อง$", re.IGNORECASE)
+
+
+def _norm(text: str) -> str:
+    return " ".join(text.lower().replace("_", " ").replace("-", " ").split())
+
+
+def place_index(
+    cameras_registry: Dict[str, Any],
+    zones_registry: Dict[str, Any],
+) -> Dict[str, Optional[Tuple[str, str]]]:
+    """
+    Normalized phrase -> ("camera" | "zone", id), from ids and display names.
+    A phrase naming more than one target maps to None (ambiguous: ask the LLM).
+    """
+    index: Dict[str, Optional[Tuple[str, str]]] = {}
+
+    def add(phrase: Any, target: Tuple[str, str]) -> None:
+        if not isinstance(phrase, str) or not phrase.strip():
+            return
+        key = _norm(phrase)
+        if key in index and index[key] != target:
+            index[key] = None
+        else:
+            index[key] = target
+
+    for cid, cam in (cameras_registry or {}).items():
+        add(cid, ("camera", cid))
+        if isinstance(cam, dict):
+            add(cam.get("name"), ("camera", cid))
+    for zid, zone in (zones_registry or {}).items():
+        add(zid, ("zone", zid))
+        if isinstance(zone, dict):
+            add(zone.get("name"), ("zone", zid))
+    return index
+
+
+def _window(kind: str, now_iso: str, timezone: str) -> Tuple[datetime, datetime, int]:
+    now = datetime.fromisoformat(now_iso)
+    if now.tzinfo is None:
+        now = now.replace(tzinfo=ZoneInfo(timezone))
+    midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    if kind == "today":
+        start, end, offset = midnight, now.replace(microsecond=0), 0
+    elif kind == "yesterday":
+        start, end, offset = midnight - timedelta(days=1), midnight, 1
+    else:  # last_night: 18:00 yesterday -> 06:00 today
+        start, end, offset = midnight - timedelta(hours=6), midnight + timedelta(hours=6), 1
+    return start, end, offset
+
+
+def match_direct_plan(
+    user_query: str,
+    places: Dict[str, Optional[Tuple[str, str]]],
+    zones_registry: Dict[str, Any],
+    now_iso: str,
+    timezone: str,
+) -> Optional[Dict[str, Any]]:
+    """
+    Plan dict for a templated DIRECT command whose place resolves to exactly
+    one registry camera or zone, else None. Validate like an LLM plan.
+    """
+    for pattern in _PATTERNS:
+        m = pattern.match(user_query)
+        if m is not None:
+            break
+    else:
+        return None
+
+    place = m.group("place").strip()
+    key = _norm(place)
+    if key not in places:  # "dining area" is a name; "street camera" is not
+        key = _norm(_PLACE_NOISE.sub("", place))
+    target = places.get(key)
+    if target is None:
+        return None
+    scope_type, target_id = target
+
+    subject = _SUBJECTS[m.group("subj").lower()]
+    when = _WHEN[" ".join(m.group("when").lower().split())]
+    start, end, offset_days = _window(when, now_iso, timezone)
+
+    if scope_type == "camera":
+        cameras, zones = [target_id], []
+    else:
+        zone = zones_registry.get(target_id) or {}
+        cameras, zones = list(zone.get("camera_ids") or []), [target_id]
+
+    return {
+        "command_type": "direct",
+        "target_scope": {"cameras": cameras, "zones": zones, "scope_type": scope_type},
+        "time_window": {
+            "type": "relative",
+            "from_iso": start.isoformat(),
+            "to_iso": end.isoformat(),
+            "from_ts": int(start.timestamp()),
+            "to_ts": int(end.timestamp()),
+            "relative": {"keyword": when, "offset_days": offset_days},
+        },
+        "event_filter": {"subjects": [subject], "activities": [], "confidence_threshold": 0.4},
+        "aggregation": {"mode": "raw_events", "group_by": [], "top_k": 100},
+        "output_format": "clips_plus_summary",
+        "needs_clarification": False,
+        "clarification_question": None,
+        "reason_brief": f"Direct command: {subject} {when} at {scope_type} {target_id} (matched locally)",
+        "confidence": 0.9,
+    }
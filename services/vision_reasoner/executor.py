@@ -1,24 +1,50 @@
 # services/vision_reasoner/executor.py
 from __future__ import annotations
 
+import asyncio
+import functools
 from typing import Any, Dict, List, Optional
 
 import httpx
+import orjson
+from cachetools import TTLCache
 
 from common.logging import get_logger
-from .schema import VisionQueryPlan
+from .schema import VisionQueryPlan, plan_to_dict
 
 # Reuse shared logger configured in main.py
 log = get_logger("vision_reasoner")
 
+# frames_rag SearchReq.top_k bounds; out-of-range values would get a 422
+RAG_TOP_K_MIN, RAG_TOP_K_MAX = 1, 100
+
 
 class RagClient:
-    def __init__(self, base_url: str = "http://localhost:8080"):
+    def __init__(
+        self,
+        base_url: str = "http://localhost:8080",
+        cache_size: int = 1024,
+        cache_ttl: float = 5.0,
+    ):
         """
         base_url SHOULD be passed from config.yaml via main.py.
         The default is only a safety fallback for tests.
+
+        Search results are cached for `cache_ttl` seconds per
+        (query, cameras, window, top_k), short enough that new frames still
+        show up on the next ask. The cache holds the raw response bytes, so
+        every hit decodes a fresh dict that callers may modify.
         """
         self.base_url = base_url.rstrip("/")
+        self._cache: TTLCache = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+        self._cache_lock = asyncio.Lock()
+        # one pooled client for the process lifetime: keep-alive instead of a
+        # fresh TCP connect per search
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=30.0,
+            limits=httpx.Limits(max_keepalive_connections=32, max_connections=64),
+        )
         log.info("RagClient initialized", extra={"base_url": self.base_url})
 
     async def search(
@@ -30,20 +56,27 @@ class RagClient:
         top_k: int = 100,
     ) -> Dict[str, Any]:
         """
-        Adapts to your existing /rag/search API.
-        Adjust the payload keys to match services/frames_rag/main.py.
+        POSTs a JSON body to /rag/search (services/frames_rag/main.py SearchReq).
+        `top_k` is clamped to what that endpoint accepts.
         """
+        top_k = min(max(int(top_k), RAG_TOP_K_MIN), RAG_TOP_K_MAX)
+        key = (text_query, tuple(camera_ids or ()), ts_from, ts_to, top_k)
+        async with self._cache_lock:
+            cached = self._cache.get(key)
+        if cached is not None:
+            log.debug("RAG search cache hit", extra={"q": text_query})
+            return orjson.loads(cached)
+
         params: Dict[str, Any] = {
             "q": text_query,
             "top_k": top_k,
         }
         if camera_ids:
-            # encode as comma-separated if your /rag/search expects that
-            params["cameras"] = ",".join(camera_ids)
+            params["cameras"] = camera_ids
         if ts_from is not None:
-            params["ts_from"] = ts_from
+            params["start"] = ts_from
         if ts_to is not None:
-            params["ts_to"] = ts_to
+            params["end"] = ts_to
 
         url = f"{self.base_url}/rag/search"
 
@@ -60,10 +93,14 @@ class RagClient:
         )
 
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                resp = await client.get(url, params=params)
-                resp.raise_for_status()
-                data = resp.json()
+            resp = await self._client.post(
+                "/rag/search",
+                content=orjson.dumps(params),
+                headers={"content-type": "application/json"},
+            )
+            resp.raise_for_status()
+            raw = resp.content
+            data = orjson.loads(raw)
         except Exception:
             log.exception("Error calling /rag/search")
             raise
@@ -71,35 +108,49 @@ class RagClient:
         hits = data.get("results") or data.get("items") or []
         log.info("RAG search completed", extra={"num_results": len(hits)})
 
+        async with self._cache_lock:
+            self._cache[key] = raw
         return data
 
+    async def warm(self) -> None:
+        """Open a pooled connection up front so the first search skips the connect."""
+        try:
+            await self._client.get("/healthz")
+        except Exception as e:
+            log.warning("RAG warm-up failed", extra={"base_url": self.base_url, "error": str(e)})
 
-def build_text_query_from_plan(plan: VisionQueryPlan) -> str:
-    """
-    Use the semantic info from the plan to construct a free-text query string
-    for the RAG service. This is intentionally simple: you can upgrade later.
-    """
-    parts: List[str] = []
+    async def aclose(self) -> None:
+        await self._client.aclose()
 
-    # Subjects and activities become positive terms
-    if plan.event_filter.subjects:
-        parts.extend(plan.event_filter.subjects)
-    if plan.event_filter.activities:
-        parts.extend(plan.event_filter.activities)
 
-    # Optionally, zone names as soft hints
-    if plan.target_scope.zones:
-        parts.extend(plan.target_scope.zones)
+@functools.lru_cache(maxsize=2048)
+def _build_text_query(subjects: tuple, activities: tuple, zones: tuple, command_type: str) -> str:
+    # Subjects and activities become positive terms;
+    # optionally, zone names as soft hints
+    parts: List[str] = [*subjects, *activities, *zones]
 
     # For indirect / pattern questions, add generic nouns
-    if plan.command_type == "indirect":
+    if command_type == "indirect":
         parts.append("person")
 
     if not parts:
-        query = "person"  # safe default for presence/security
-    else:
-        # dedupe while preserving order
-        query = " ".join(dict.fromkeys(parts))
+        return "person"  # safe default for presence/security
+    # dedupe while preserving order
+    return " ".join(dict.fromkeys(parts))
+
+
+def build_text_query_from_plan(plan: VisionQueryPlan) -> str:
+    """
+    Use the semantic info from the plan to construct a free-text query string
+    for the RAG service. This is intentionally simple: you can upgrade later.
+    Memoized on the plan fields that feed it.
+    """
+    query = _build_text_query(
+        tuple(plan.event_filter.subjects or ()),
+        tuple(plan.event_filter.activities or ()),
+        tuple(plan.target_scope.zones or ()),
+        plan.command_type,
+    )
 
     log.debug(
         "Built text query from plan",
@@ -118,10 +169,12 @@ def build_text_query_from_plan(plan: VisionQueryPlan) -> str:
 async def execute_plan(
     rag: RagClient,
     plan: VisionQueryPlan,
+    plan_dict: Optional[Dict[str, Any]] = None,
 ) -> Dict[str, Any]:
     """
     Executes the plan via /rag/search (and later /rag/aggregate) and returns
     a structure that the FastAPI endpoint can post-process for the client.
+    Pass `plan_dict` if the caller already dumped the plan.
     """
     log.info(
         "Executing plan against RAG",
@@ -159,7 +212,7 @@ async def execute_plan(
     )
 
     return {
-        "plan": plan.model_dump(),
+        "plan": plan_dict if plan_dict is not None else plan_to_dict(plan),
         "search_query": text_query,
         "rag_result": search_result,
     }
@@ -2,19 +2,22 @@
 from __future__ import annotations
 
 import os
+from collections import defaultdict
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, Tuple
+from typing import Any, DefaultDict, Dict, Tuple
 
 import uvicorn
-import yaml
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 
+from common.config import load_yaml
 from common.logging import get_logger
-from .reasoner import VisionReasonerConfig, build_plan
+from . import reasoner
+from .reasoner import PlanBatcher, Registries, VisionReasonerConfig, build_plan
 from .executor import RagClient, execute_plan
-from .time_utils import fill_timestamps_from_iso
+from .plan_cache import ExactPlanCache, OnnxEmbedder, SemanticPlanCache
+from .schema import plan_to_dict
 
 # --------------------------------------------------------------------
 # Config loading
@@ -29,8 +32,7 @@ def load_config() -> Dict[str, Any]:
     path = Path(cfg_path)
     if not path.exists():
         raise RuntimeError(f"Config file not found at {path!s}")
-    with path.open("r", encoding="utf-8") as f:
-        return yaml.safe_load(f) or {}
+    return load_yaml(path)
 
 
 config: Dict[str, Any] = load_config()
@@ -77,8 +79,7 @@ def _load_yaml(path_str: str) -> Dict[str, Any]:
         log.warning("YAML not found", extra={"path": path_str})
         return {}
     try:
-        with path.open("r", encoding="utf-8") as f:
-            data = yaml.safe_load(f) or {}
+        data = load_yaml(path)
         log.info("Loaded YAML", extra={"path": path_str})
         return data
     except Exception as e:
@@ -102,14 +103,18 @@ def _build_registries_from_edge_config(edge_cfg_path: str) -> Tuple[Dict[str, An
     cameras_list = raw.get("cameras", []) or []
     zones_list = raw.get("zones", []) or []
 
+    # zone id -> camera ids, kept apart from the zone dicts so each insert is
+    # an O(1) ordered-set add instead of a list membership scan
+    camera_ids: DefaultDict[str, Dict[str, None]] = defaultdict(dict)
+
     zones_by_id: Dict[str, Any] = {}
     for z in zones_list:
         zid = z.get("id")
         if not zid:
             continue
-        zone = dict(z)
-        zone.setdefault("camera_ids", [])
-        zones_by_id[zid] = zone
+        # shallow copy: `raw` is the cached parse from load_yaml
+        zones_by_id[zid] = dict(z)
+        camera_ids[zid].update(dict.fromkeys(z.get("camera_ids") or []))
 
     cameras_by_id: Dict[str, Any] = {}
     for c in cameras_list:
@@ -132,11 +137,11 @@ def _build_registries_from_edge_config(edge_cfg_path: str) -> Tuple[Dict[str, An
                     "type": "unknown",
                     "description": f"Auto-generated zone for {zone_id}",
                     "tags": [zone_id],
-                    "camera_ids": [],
                 }
-            zones_by_id[zone_id].setdefault("camera_ids", [])
-            if cid not in zones_by_id[zone_id]["camera_ids"]:
-                zones_by_id[zone_id]["camera_ids"].append(cid)
+            camera_ids[zone_id][cid] = None
+
+    for zid, zone in zones_by_id.items():
+        zone["camera_ids"] = list(camera_ids[zid])
 
     log.info(
         "Built registries from edge config",
@@ -195,6 +200,9 @@ EVENT_TYPES: Dict[str, Any] = {
 if not CAMERAS_REGISTRY:
     log.warning("CAMERAS_REGISTRY is empty; camera inference will be limited")
 
+# Serialized prompt block + fingerprint, computed once for every request
+REGISTRIES = Registries.build(CAMERAS_REGISTRY, ZONES_REGISTRY, EVENT_TYPES)
+
 # --------------------------------------------------------------------
 # RAG client configuration (from frames_rag section)
 # --------------------------------------------------------------------
@@ -205,6 +213,31 @@ frames_rag_base_url = f"http://{frames_rag_host}:{frames_rag_port}"
 
 RAG_CLIENT = RagClient(base_url=frames_rag_base_url)
 
+PLAN_BATCHER = (
+    PlanBatcher(VISION_CFG, VISION_CFG.batching_max_size, VISION_CFG.batching_max_wait_ms)
+    if VISION_CFG.batching_enabled
+    else None
+)
+
+EXACT_PLAN_CACHE = ExactPlanCache(VISION_CFG.exact_cache_size) if VISION_CFG.exact_cache_size > 0 else None
+
+PLAN_CACHE = (
+    SemanticPlanCache(
+        ollama_base_url=VISION_CFG.ollama_base_url,
+        embed_model=VISION_CFG.semantic_cache_embed_model,
+        threshold=VISION_CFG.semantic_cache_threshold,
+        top_k=VISION_CFG.semantic_cache_top_k,
+        maxsize=VISION_CFG.semantic_cache_size,
+        embedder=(
+            OnnxEmbedder(VISION_CFG.semantic_cache_onnx_model, VISION_CFG.semantic_cache_tokenizer)
+            if VISION_CFG.semantic_cache_onnx_model
+            else None
+        ),
+    )
+    if VISION_CFG.semantic_cache_enabled
+    else None
+)
+
 log.info(
     "Vision Reasoner + RAG configuration initialized",
     extra={
@@ -223,6 +256,21 @@ log.info(
 app = FastAPI(title="NANA Vision Reasoner")
 
 
+@app.on_event("startup")
+async def warm_clients() -> None:
+    await RAG_CLIENT.warm()
+
+
+@app.on_event("shutdown")
+async def close_clients() -> None:
+    await RAG_CLIENT.aclose()
+    await reasoner.aclose()
+    if PLAN_BATCHER is not None:
+        await PLAN_BATCHER.aclose()
+    if PLAN_CACHE is not None:
+        await PLAN_CACHE.aclose()
+
+
 class ReasonRequest(BaseModel):
     query: str
     language: str | None = None  # optional hint: "en" or "th"
@@ -249,17 +297,15 @@ async def reason_query(req: ReasonRequest):
             now_iso=now_iso,
             timezone=TIMEZONE,
             user_query=req.query,
+            exact_cache=EXACT_PLAN_CACHE,
+            semantic_cache=PLAN_CACHE,
+            batcher=PLAN_BATCHER,
+            registries=REGISTRIES,
         )
     except Exception as e:
         log.exception("Failed to build plan")
         raise HTTPException(status_code=500, detail=f"Plan error: {e}")
 
-    # LLM decides from_iso/to_iso; we just parse to epoch seconds
-    try:
-        fill_timestamps_from_iso(plan, timezone_str=TIMEZONE)
-    except Exception:
-        log.exception("Failed to convert ISO times to timestamps")
-
     log.info(
         "Plan built",
         extra={
@@ -273,9 +319,12 @@ async def reason_query(req: ReasonRequest):
         },
     )
 
+    # dumped once; reused by both branches below
+    plan_dict = plan_to_dict(plan)
+
     if plan.needs_clarification:
         return ReasonResponse(
-            plan=plan.model_dump(),
+            plan=plan_dict,
             search_query="",
             rag_result={
                 "status": "needs_clarification",
@@ -287,6 +336,7 @@ async def reason_query(req: ReasonRequest):
         result = await execute_plan(
             rag=RAG_CLIENT,
             plan=plan,
+            plan_dict=plan_dict,
         )
     except Exception as e:
         log.exception("Failed to execute plan")
@@ -319,14 +369,17 @@ async def reason_plan_only(req: ReasonRequest):
             now_iso=now_iso,
             timezone=TIMEZONE,
             user_query=req.query,
+            exact_cache=EXACT_PLAN_CACHE,
+            semantic_cache=PLAN_CACHE,
+            batcher=PLAN_BATCHER,
+            registries=REGISTRIES,
         )
-        fill_timestamps_from_iso(plan, timezone_str=TIMEZONE)
     except Exception as e:
         log.exception("Failed to build plan (plan-only)")
         raise HTTPException(status_code=500, detail=f"Plan error: {e}")
 
     return ReasonResponse(
-        plan=plan.model_dump(),
+        plan=plan_to_dict(plan),
         search_query="",
         rag_result={"status": "plan_only"},
     )
@@ -346,6 +399,12 @@ def main():
         "services.vision_reasoner.main:app",
         host=host,
         port=port,
+        loop="uvloop",
+        http="httptools",
+        # One worker by default: the plan caches, PlanBatcher and the client
+        # pools are per process, so extra workers split cache hits and
+        # batches and multiply Ollama/RAG connections. Opt in via WEB_WORKERS.
+        workers=int(os.getenv("WEB_WORKERS", 1)),
         reload=False,
     )
 
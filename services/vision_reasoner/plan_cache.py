@@ -0,0 +1,171 @@
+# services/vision_reasoner/plan_cache.py
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+import numpy as np
+import orjson
+
+from common.logging import get_logger
+
+log = get_logger("vision_reasoner")
+
+
+class ExactPlanCache:
+    """
+    LRU of validated plan dicts keyed by (normalized query, registry
+    fingerprint, date, model): an identical question asked again the same day
+    skips the LLM round trip. Stores plain dicts; callers re-validate a copy.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Tuple[str, str, str, str], Dict[str, Any]]" = OrderedDict()
+
+    @staticmethod
+    def key(user_query: str, fingerprint: str, date: str, model: str) -> Tuple[str, str, str, str]:
+        return (user_query.strip().lower(), fingerprint, date, model)
+
+    def get(self, key: Tuple[str, str, str, str]) -> Optional[Dict[str, Any]]:
+        plan_dict = self._data.get(key)
+        if plan_dict is not None:
+            self._data.move_to_end(key)
+        return plan_dict
+
+    def put(self, key: Tuple[str, str, str, str], plan_dict: Dict[str, Any]) -> None:
+        self._data[key] = plan_dict
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+
+class OnnxEmbedder:
+    """
+    Local sentence embedding with an ONNX export of a MiniLM-style model
+    (e.g. dynamic-int8 quantized all-MiniLM-L6-v2): Rust tokenizer + one
+    CPU session.run, mean-pooled and L2-normalized. About a millisecond per
+    short query, versus an HTTP round trip to Ollama.
+
+    Needs the optional `onnxruntime` and `tokenizers` packages.
+    """
+
+    def __init__(self, model_path: str, tokenizer_path: str, max_length: int = 128):
+        try:
+            import onnxruntime as ort
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise RuntimeError(f"ONNX semantic cache embedder needs onnxruntime and tokenizers: {e}")
+
+        self._tok = Tokenizer.from_file(tokenizer_path)
+        self._tok.enable_truncation(max_length)
+        opts = ort.SessionOptions()
+        opts.intra_op_num_threads = 1  # single short sequence; threads only add wake-up latency
+        self._sess = ort.InferenceSession(model_path, sess_options=opts, providers=["CPUExecutionProvider"])
+        self._inputs = {i.name for i in self._sess.get_inputs()}
+        log.info("ONNX query embedder loaded", extra={"model": model_path})
+
+    def __call__(self, text: str) -> Optional[np.ndarray]:
+        enc = self._tok.encode(text)
+        ids = np.asarray([enc.ids], dtype=np.int64)
+        mask = np.asarray([enc.attention_mask], dtype=np.int64)
+        feed = {"input_ids": ids, "attention_mask": mask}
+        if "token_type_ids" in self._inputs:
+            feed["token_type_ids"] = np.zeros_like(ids)
+        hidden = self._sess.run(None, feed)[0][0]  # (seq, dim)
+        m = mask[0].astype(np.float32)
+        v = np.ascontiguousarray((m @ hidden) / max(float(m.sum()), 1.0), dtype=np.float32)
+        n = float(np.linalg.norm(v))
+        return v / n if n else None
+
+
+class SemanticPlanCache:
+    """
+    Reuses a validated plan for paraphrased queries ("show me people yesterday"
+    vs "who was there yesterday"): the query is embedded via Ollama
+    /api/embeddings (or locally, with an OnnxEmbedder) and compared by cosine
+    similarity against recent queries.
+
+    A hit requires similarity >= threshold AND the same registry fingerprint
+    AND the same calendar date as when the plan was made. Bounded to
+    `maxsize` entries with LRU eviction.
+    """
+
+    def __init__(
+        self,
+        ollama_base_url: str,
+        embed_model: str,
+        threshold: float = 0.87,
+        top_k: int = 1,
+        maxsize: int = 512,
+        embedder: Optional[OnnxEmbedder] = None,
+    ):
+        self.embedder = embedder
+        self.url = f"{ollama_base_url.rstrip('/')}/api/embeddings"
+        self.embed_model = embed_model
+        self.threshold = threshold
+        self.top_k = max(1, top_k)
+        self.maxsize = maxsize
+        self._client = httpx.AsyncClient(timeout=10.0)
+        # (maxsize, dim), one row per slot; slots fill 0..n-1 before any is
+        # reused, so the live rows are always the contiguous prefix [:n]
+        self._vecs: Optional[np.ndarray] = None
+        # slot -> (fingerprint, date, plan_dict); order is LRU -> MRU
+        self._slots: "OrderedDict[int, Tuple[str, str, Dict[str, Any]]]" = OrderedDict()
+
+    async def embed(self, text: str) -> Optional[np.ndarray]:
+        """L2-normalized query embedding, or None if the embedder is unavailable."""
+        if self.embedder is not None:
+            try:
+                return self.embedder(text)
+            except Exception as e:
+                log.warning("Semantic cache embedding failed", extra={"error": str(e)})
+                return None
+        try:
+            resp = await self._client.post(self.url, json={"model": self.embed_model, "prompt": text})
+            resp.raise_for_status()
+            emb = orjson.loads(resp.content).get("embedding")
+        except Exception as e:
+            log.warning("Semantic cache embedding failed", extra={"error": str(e)})
+            return None
+        if not emb:
+            return None
+        v = np.asarray(emb, dtype=np.float32)
+        n = float(np.linalg.norm(v))
+        return v / n if n else None
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+    def lookup(self, vec: np.ndarray, fingerprint: str, date: str) -> Optional[Dict[str, Any]]:
+        if self._vecs is None or not self._slots or vec.shape[0] != self._vecs.shape[1]:
+            return None
+        # one GEMV over the live prefix; row index == slot
+        sims = self._vecs[: len(self._slots)] @ vec
+        if self.top_k == 1:
+            order = (int(np.argmax(sims)),)
+        else:
+            order = np.argsort(-sims)[: self.top_k]
+        for i in order:
+            if sims[i] < self.threshold:
+                break
+            slot = int(i)
+            fp, d, plan_dict = self._slots[slot]
+            if fp == fingerprint and d == date:
+                self._slots.move_to_end(slot)
+                log.info("Semantic plan cache hit", extra={"similarity": float(sims[i])})
+                return plan_dict
+        return None
+
+    def add(self, vec: np.ndarray, fingerprint: str, date: str, plan_dict: Dict[str, Any]) -> None:
+        if self._vecs is None:
+            self._vecs = np.zeros((self.maxsize, vec.shape[0]), dtype=np.float32)
+        elif vec.shape[0] != self._vecs.shape[1]:
+            return  # embedding model changed under us; keep the existing space
+        if len(self._slots) < self.maxsize:
+            slot = len(self._slots)
+        else:
+            slot, _ = self._slots.popitem(last=False)
+        self._vecs[slot] = vec
+        self._slots[slot] = (fingerprint, date, plan_dict)
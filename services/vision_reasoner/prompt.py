@@ -66,7 +66,9 @@ DEFINITIONS:
 
 TIME:
 
-- You are given the current time and timezone in the developer message: `now` and `timezone`.
+- The user message starts with the current time and timezone, then the question:
+    NOW=<ISO-8601 datetime> TZ=<IANA timezone>
+    QUERY: <user question>
 - For any question that implies a time window (e.g. "yesterday", "two days ago",
   "last night after 10pm", "last 7 days"), you MUST infer concrete start and end
   datetimes in that timezone.
@@ -120,3 +122,15 @@ STRICTNESS:
 
 - OUTPUT ONLY THE JSON OBJECT. NO extra text. NO explanations. NO markdown.
 """
+
+# Appended as an extra system message when several user queries are planned
+# in one LLM call (reasoner.PlanBatcher).
+VISION_BATCH_ADDENDUM = """
+BATCH MODE:
+The user message starts with one NOW=... TZ=... line that applies to all
+questions, followed by several independent questions, one per line, each
+prefixed with its number ("1. ...", "2. ...").
+Plan each question on its own, exactly as you would if it were asked alone.
+Return ONE JSON object of the form {"plans": [<plan for 1>, <plan for 2>, ...]}
+with exactly one plan per question, in the same order. No other keys, no prose.
+""".strip()
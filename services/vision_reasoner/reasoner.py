@@ -1,15 +1,25 @@
 # services/vision_reasoner/reasoner.py
 from __future__ import annotations
 
-import json
-from typing import Any, Dict
+import asyncio
+import copy
+import functools
+import hashlib
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
 
 import httpx
-from pydantic import ValidationError
+import msgspec
+import orjson
 
 from common.logging import get_logger
-from .schema import VisionQueryPlan
-from .prompt import VISION_SYSTEM_PROMPT
+from .direct_plan import match_direct_plan, place_index
+from .plan_cache import ExactPlanCache, SemanticPlanCache
+from .schema import VisionQueryPlan, plan_from_dict, plan_from_json, plan_to_dict
+from .time_utils import day_start_ts, fill_timestamps_from_iso
+from .prompt import VISION_BATCH_ADDENDUM, VISION_SYSTEM_PROMPT
 
 # Reuse the same logger name as main.py
 log = get_logger("vision_reasoner")
@@ -17,6 +27,16 @@ log = get_logger("vision_reasoner")
 # Default location of the edge pipeline config, kept inside this repo
 EDGE_CONFIG_DEFAULT = "config/edge_config_read_only.yaml"
 
+# One pooled client for all Ollama calls (keep-alive, no per-request connect)
+_CLIENT = httpx.AsyncClient(
+    timeout=60.0,
+    limits=httpx.Limits(max_keepalive_connections=32, max_connections=64),
+)
+
+
+async def aclose() -> None:
+    await _CLIENT.aclose()
+
 
 class VisionReasonerConfig:
     """
@@ -42,6 +62,21 @@ class VisionReasonerConfig:
         self.clarify_threshold: float = float(cfg.get("clarify_threshold", 0.6))
         self.timezone: str = cfg.get("timezone", "Asia/Bangkok")
 
+        # Ollama constrained decoding: "json" (any JSON object), "schema"
+        # (VisionQueryPlan JSON Schema; Ollama >= 0.5) or "none"
+        self.ollama_format: str = str(cfg.get("ollama_format", "json")).lower()
+        if self.ollama_format not in ("json", "schema", "none"):
+            raise RuntimeError(f"vision_reasoner.ollama_format must be json|schema|none, got {self.ollama_format!r}")
+        # stream the reply and stop reading once the plan object closes
+        self.ollama_stream: bool = bool(cfg.get("ollama_stream", True))
+        # plan templated DIRECT commands locally, without the LLM
+        self.direct_fast_path: bool = bool(cfg.get("direct_fast_path", True))
+
+        # Micro-batching of concurrent LLM calls (off by default)
+        self.batching_enabled: bool = bool(cfg.get("batching_enabled", False))
+        self.batching_max_size: int = int(cfg.get("batching_max_size", 8))
+        self.batching_max_wait_ms: float = float(cfg.get("batching_max_wait_ms", 10))
+
         # Optional legacy paths for separate cameras/zones YAMLs
         self.cameras_config: str = cfg.get("cameras_config", "config/cameras.yaml")
         self.zones_config: str = cfg.get("zones_config", "config/zones.yaml")
@@ -49,106 +84,311 @@ class VisionReasonerConfig:
         # Path to the read-only edge config inside this repo
         self.edge_config: str = cfg.get("edge_config", EDGE_CONFIG_DEFAULT)
 
-        log.info(
-            "VisionReasonerConfig initialized",
-            extra={
-                "ollama_base_url": self.ollama_base_url,
-                "ollama_model": self.ollama_model,
-                "clarify_threshold": self.clarify_threshold,
-                "timezone": self.timezone,
-                "cameras_config": self.cameras_config,
-                "zones_config": self.zones_config,
-                "edge_config": self.edge_config,
+        # Exact-match plan cache size (identical query, same day); 0 disables
+        self.exact_cache_size: int = int(cfg.get("exact_cache_size", 1024))
+
+        # Semantic plan cache: reuse plans for paraphrased queries (off by default)
+        self.semantic_cache_enabled: bool = bool(cfg.get("semantic_cache_enabled", False))
+        self.semantic_cache_threshold: float = float(cfg.get("semantic_cache_threshold", 0.87))
+        self.semantic_cache_top_k: int = int(cfg.get("semantic_cache_top_k", 1))
+        self.semantic_cache_size: int = int(cfg.get("semantic_cache_size", 512))
+        self.semantic_cache_embed_model: str = cfg.get("semantic_cache_embed_model", "nomic-embed-text")
+        # Optional local ONNX embedder (model.onnx + tokenizer.json) instead of Ollama
+        self.semantic_cache_onnx_model: str = cfg.get("semantic_cache_onnx_model", "") or ""
+        self.semantic_cache_tokenizer: str = cfg.get("semantic_cache_tokenizer", "") or ""
+
+        if log.isEnabledFor(logging.INFO):
+            log.info(
+                "VisionReasonerConfig initialized",
+                extra={
+                    "ollama_base_url": self.ollama_base_url,
+                    "ollama_model": self.ollama_model,
+                    "clarify_threshold": self.clarify_threshold,
+                    "timezone": self.timezone,
+                    "ollama_format": self.ollama_format,
+                    "ollama_stream": self.ollama_stream,
+                    "batching_enabled": self.batching_enabled,
+                    "cameras_config": self.cameras_config,
+                    "zones_config": self.zones_config,
+                    "edge_config": self.edge_config,
+                    "semantic_cache_enabled": self.semantic_cache_enabled,
+                },
+            )
+
+
+_PROMPT_OPTS = orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+
+_REGISTRY_NOTES = (
+    "You must only use camera_ids and zones from cameras_registry/zones_registry. "
+    "If a user phrase can map to multiple cameras, prefer zone-level scope or "
+    "ask for clarification."
+)
+
+
+@dataclass(frozen=True, eq=False)
+class Registries:
+    """
+    Camera/zone/event registries with their developer prompt and
+    fingerprint, computed once when the config is loaded. The dicts must not
+    be mutated afterwards.
+
+    The developer prompt depends on nothing else (the clock goes in the
+    user message), so system + developer messages form a prefix that is
+    byte-identical across requests and Ollama can reuse its KV cache for it.
+    """
+
+    cameras: Dict[str, Any]
+    zones: Dict[str, Any]
+    event_types: Dict[str, Any]
+    developer_prompt: str
+    fingerprint: str  # hash of developer_prompt; a cached plan is only valid for these registries
+    places: Dict[str, Optional[Tuple[str, str]]]  # phrase -> target, for direct_plan
+
+    @classmethod
+    def build(
+        cls,
+        cameras_registry: Dict[str, Any],
+        zones_registry: Dict[str, Any],
+        event_types: Dict[str, Any],
+    ) -> "Registries":
+        blob = b"RUNTIME CONTEXT:\n" + orjson.dumps(
+            {
+                "cameras_registry": cameras_registry,
+                "zones_registry": zones_registry,
+                "event_types": event_types,
+                "notes": _REGISTRY_NOTES,
             },
+            option=_PROMPT_OPTS,
         )
+        return cls(
+            cameras=cameras_registry,
+            zones=zones_registry,
+            event_types=event_types,
+            developer_prompt=blob.decode(),
+            fingerprint=hashlib.blake2b(blob, digest_size=16).hexdigest(),
+            places=place_index(cameras_registry, zones_registry),
+        )
+
 
+# (id(cameras), id(zones), id(event_types)) -> Registries, for callers passing plain dicts
+_REGISTRIES: "OrderedDict[Tuple[int, int, int], Registries]" = OrderedDict()
 
-def build_developer_prompt(
+
+def _registries(
     cameras_registry: Dict[str, Any],
     zones_registry: Dict[str, Any],
     event_types: Dict[str, Any],
-    now_iso: str,
-    timezone: str,
-) -> str:
+) -> Registries:
     """
-    Injects runtime context into the developer message for the LLM.
-    """
-    payload = {
-        "now": now_iso,
-        "timezone": timezone,
-        "cameras_registry": cameras_registry,
-        "zones_registry": zones_registry,
-        "event_types": event_types,
-        "notes": (
-            "You must only use camera_ids and zones from cameras_registry/zones_registry. "
-            "If a user phrase can map to multiple cameras, prefer zone-level scope or "
-            "ask for clarification."
-        ),
-    }
+    Registries for dicts not wrapped at config load, built once per registry
+    objects. The entry holds references to the dicts, keeping their ids unique.
+    """
+    key = (id(cameras_registry), id(zones_registry), id(event_types))
+    hit = _REGISTRIES.get(key)
+    if hit is None:
+        hit = _REGISTRIES[key] = Registries.build(cameras_registry, zones_registry, event_types)
+        while len(_REGISTRIES) > 8:
+            _REGISTRIES.popitem(last=False)
+    return hit
 
-    log.debug(
-        "Building developer prompt",
-        extra={
-            "num_cameras": len(cameras_registry or {}),
-            "num_zones": len(zones_registry or {}),
-            "timezone": timezone,
-        },
-    )
 
-    return "RUNTIME CONTEXT:\n" + json.dumps(payload, ensure_ascii=False, indent=2)
+def build_developer_prompt(registries: Registries) -> str:
+    """
+    Developer message for the LLM: the registries and notes, precomputed by
+    Registries.build. Time context goes in the user message (user_message).
+    """
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug(
+            "Building developer prompt",
+            extra={
+                "num_cameras": len(registries.cameras or {}),
+                "num_zones": len(registries.zones or {}),
+            },
+        )
+    return registries.developer_prompt
 
 
-async def call_ollama_chat(
+def user_message(now_iso: str, timezone: str, user_query: str) -> str:
+    """
+    User turn: a short NOW/TZ header, then the question. The only per-request
+    text, so it goes last, after the cacheable system + developer prefix.
+    """
+    return f"NOW={now_iso} TZ={timezone}\nQUERY: {user_query}"
+
+
+@functools.lru_cache(maxsize=8)
+def _static_message(role: str, content: str) -> orjson.Fragment:
+    """
+    Chat message serialized once and embedded verbatim in later request
+    bodies; for the big, static system prompt.
+    """
+    return orjson.Fragment(orjson.dumps({"role": role, "content": content}))
+
+
+# JSON Schema of a plan, encoded once for `"format": <schema>` requests;
+# msgspec emits {"$ref": "#/$defs/VisionQueryPlan", "$defs": {...}}
+_PLAN_SCHEMA_DICT = msgspec.json.schema(VisionQueryPlan)
+_PLAN_SCHEMA = orjson.Fragment(orjson.dumps(_PLAN_SCHEMA_DICT))
+# ... and wrapped as {"plans": [plan, ...]} for batched calls
+_BATCH_SCHEMA = orjson.Fragment(orjson.dumps({
+    "$defs": _PLAN_SCHEMA_DICT["$defs"],
+    "type": "object",
+    "properties": {"plans": {"type": "array", "items": {"$ref": _PLAN_SCHEMA_DICT["$ref"]}}},
+    "required": ["plans"],
+}))
+
+
+def _format_field(cfg: VisionReasonerConfig, batch: bool = False) -> Any:
+    if cfg.ollama_format == "schema":
+        return _BATCH_SCHEMA if batch else _PLAN_SCHEMA
+    if cfg.ollama_format == "json":
+        return "json"
+    return None
+
+
+class _OllamaMessage(msgspec.Struct):
+    content: str = ""
+
+
+class _OllamaChatResponse(msgspec.Struct):
+    """The fields we read from /api/chat (or one streamed line of it); the rest is skipped."""
+    message: _OllamaMessage = msgspec.field(default_factory=_OllamaMessage)
+    done: bool = False
+
+
+_CHAT_DECODER = msgspec.json.Decoder(_OllamaChatResponse)
+
+
+class _ObjectEnd:
+    """
+    Incremental scanner for where the first top-level JSON object ends,
+    tracking brace depth outside strings. Text before the first "{" is ignored.
+    """
+
+    __slots__ = ("depth", "started", "in_str", "esc")
+
+    def __init__(self):
+        self.depth = 0
+        self.started = False
+        self.in_str = False
+        self.esc = False
+
+    def feed(self, text: str) -> int:
+        """Index just past the closing "}" within `text`, or -1 if still open."""
+        for i, ch in enumerate(text):
+            if self.in_str:
+                if self.esc:
+                    self.esc = False
+                elif ch == "\\":
+                    self.esc = True
+                elif ch == '"':
+                    self.in_str = False
+            elif ch == "{":
+                self.depth += 1
+                self.started = True
+            elif not self.started:
+                continue
+            elif ch == '"':
+                self.in_str = True
+            elif ch == "}":
+                self.depth -= 1
+                if self.depth == 0:
+                    return i + 1
+        return -1
+
+
+async def _chat_streamed(url: str, body: Dict[str, Any]) -> str:
+    """
+    Stream /api/chat token lines and return the content up to the end of the
+    first JSON object, closing the connection there instead of waiting for
+    the model to finish. If the stream ends first, returns whatever arrived.
+    """
+    body_bytes = orjson.dumps({**body, "stream": True})
+    parts = []
+    scan = _ObjectEnd()
+    async with _CLIENT.stream("POST", url, content=body_bytes, headers={"content-type": "application/json"}) as resp:
+        resp.raise_for_status()
+        async for line in resp.aiter_lines():
+            if not line:
+                continue
+            chunk = _CHAT_DECODER.decode(line)
+            piece = chunk.message.content
+            end = scan.feed(piece)
+            if end >= 0:
+                parts.append(piece[:end])
+                break
+            parts.append(piece)
+            if chunk.done:
+                break
+    return "".join(parts)
+
+
+async def _chat_content(
     cfg: VisionReasonerConfig,
     system_prompt: str,
     developer_prompt: str,
     user_query: str,
-) -> Dict[str, Any]:
+    batch: bool = False,
+) -> str:
     """
-    Calls Ollama's chat API and returns the parsed JSON from the response.
+    Calls Ollama's chat API and returns the reply text (expected to be JSON).
+    With `batch`, `user_query` holds numbered questions and the reply is
+    {"plans": [...]} (see PlanBatcher).
     """
     url = f"{cfg.ollama_base_url}/api/chat"
-    messages = [
-        {"role": "system", "content": system_prompt},
+    messages = [_static_message("system", system_prompt)]
+    if batch:
+        messages.append(_static_message("system", VISION_BATCH_ADDENDUM))
+    messages += [
         {"role": "system", "content": developer_prompt},
         {"role": "user", "content": user_query},
     ]
-    body = {
+    body: Dict[str, Any] = {
         "model": cfg.ollama_model,
         "messages": messages,
         "stream": False,
     }
+    fmt = _format_field(cfg, batch=batch)
+    if fmt is not None:
+        # constrained decoding: the reply is bare JSON, no prose or fences
+        body["format"] = fmt
 
     log.info(
         "Calling Ollama for reasoning plan",
-        extra={"url": url, "model": cfg.ollama_model},
+        extra={"url": url, "model": cfg.ollama_model, "stream": cfg.ollama_stream},
     )
 
     try:
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            resp = await client.post(url, json=body)
+        if cfg.ollama_stream:
+            content = await _chat_streamed(url, body)
+        else:
+            resp = await _CLIENT.post(url, content=orjson.dumps(body), headers={"content-type": "application/json"})
             resp.raise_for_status()
-            data = resp.json()
+            content = _CHAT_DECODER.decode(resp.content).message.content
     except Exception:
         log.exception("Error calling Ollama chat API")
         raise
 
-    content = data.get("message", {}).get("content", "").strip()
-    log.debug(
-        "Raw Ollama content received (truncated)",
-        extra={"preview": content[:200]},
-    )
+    content = content.strip()
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug(
+            "Raw Ollama content received (truncated)",
+            extra={"preview": content[:200]},
+        )
+    return content
+
 
+def _parse_plan_json(content: str) -> Dict[str, Any]:
     # The model has been instructed to output ONLY JSON
     try:
-        parsed = json.loads(content)
+        parsed = orjson.loads(content)
         return parsed
-    except json.JSONDecodeError:
+    except orjson.JSONDecodeError:
         # In case the LLM still wraps JSON in text, try to extract it
         try:
             start = content.index("{")
             end = content.rindex("}") + 1
-            parsed = json.loads(content[start:end])
+            parsed = orjson.loads(content[start:end])
             return parsed
         except Exception as e:
             log.exception("Failed to parse LLM plan JSON")
@@ -157,38 +397,193 @@ async def call_ollama_chat(
             ) from e
 
 
-def _normalize_time_window_fields(plan_dict: Dict[str, Any]) -> Dict[str, Any]:
+async def call_ollama_chat(
+    cfg: VisionReasonerConfig,
+    system_prompt: str,
+    developer_prompt: str,
+    user_query: str,
+    batch: bool = False,
+) -> Dict[str, Any]:
+    """
+    Calls Ollama's chat API and returns the parsed JSON from the response.
     """
-    LLM sometimes puts ISO strings into from_ts/to_ts fields instead of from_iso/to_iso.
-    This helper normalizes that BEFORE Pydantic validation:
+    content = await _chat_content(cfg, system_prompt, developer_prompt, user_query, batch=batch)
+    return _parse_plan_json(content)
+
 
-    - If time_window.from_ts is a string and from_iso is missing, move it to from_iso.
-    - If time_window.to_ts is a string and to_iso is missing, move it to to_iso.
+class PlanBatcher:
+    """
+    Coalesces concurrent LLM plan requests: the first request waits up to
+    `max_wait_ms` for others (at most `max_batch_size` in total), then all of
+    them go out as ONE chat call with numbered questions and the reply's
+    {"plans": [...]} is split back to the callers.
+
+    Requests are expected to share a developer prompt (it only depends on the
+    registries); the batch is headed by the first request's NOW/TZ, the
+    others being a few ms apart. If the model returns the wrong number of
+    plans, every caller falls back to its own single call.
+    """
+
+    def __init__(self, cfg: VisionReasonerConfig, max_batch_size: int = 8, max_wait_ms: float = 10):
+        self.cfg = cfg
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: "asyncio.Queue[Tuple[str, str, str, str, asyncio.Future]]" = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+        # in-flight dispatches: strong refs so they are not GC'd mid-call
+        self._tasks: "set[asyncio.Task]" = set()
+
+    async def submit(self, developer_prompt: str, user_query: str, now_iso: str, timezone: str) -> Dict[str, Any]:
+        """Plan dict for `user_query`, possibly planned together with others."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._collect())
+        fut = asyncio.get_running_loop().create_future()
+        await self._queue.put((developer_prompt, user_query, now_iso, timezone, fut))
+        return await fut
+
+    async def aclose(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        # still-queued requests would never be dispatched now
+        while not self._queue.empty():
+            *_, fut = self._queue.get_nowait()
+            if not fut.done():
+                fut.cancel()
+
+    async def _collect(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            # dispatch without blocking collection of the next batch
+            task = asyncio.create_task(self._dispatch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._on_dispatched)
+
+    def _on_dispatched(self, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            log.error("Batched plan dispatch failed", exc_info=task.exception())
+
+    async def _single(
+        self, developer_prompt: str, user_query: str, now_iso: str, timezone: str, fut: asyncio.Future
+    ) -> None:
+        try:
+            result = await call_ollama_chat(
+                self.cfg, VISION_SYSTEM_PROMPT, developer_prompt, user_message(now_iso, timezone, user_query)
+            )
+        except Exception as e:
+            if not fut.done():
+                fut.set_exception(e)
+            return
+        if not fut.done():
+            fut.set_result(result)
+
+    async def _dispatch(self, batch: list) -> None:
+        try:
+            await self._run_batch(batch)
+        finally:
+            # cancelled (aclose) or failed unexpectedly: don't leave callers hanging
+            for *_, fut in batch:
+                if not fut.done():
+                    fut.cancel()
+
+    async def _run_batch(self, batch: list) -> None:
+        if len(batch) == 1:
+            await self._single(*batch[0])
+            return
+
+        _, _, now_iso, timezone, _ = batch[0]
+        numbered = f"NOW={now_iso} TZ={timezone}\n" + "\n".join(
+            # one line per question: a multi-line query must not shift the numbering
+            f"{i}. {' '.join(item[1].split())}" for i, item in enumerate(batch, 1)
+        )
+        log.info("Dispatching batched plan request", extra={"batch_size": len(batch)})
+        plans = None
+        try:
+            reply = await call_ollama_chat(self.cfg, VISION_SYSTEM_PROMPT, batch[0][0], numbered, batch=True)
+            plans = reply.get("plans") if isinstance(reply, dict) else None
+        except Exception:
+            log.exception("Batched plan request failed; falling back to single calls")
+
+        if isinstance(plans, list) and len(plans) == len(batch) and all(isinstance(p, dict) for p in plans):
+            for item, plan_dict in zip(batch, plans):
+                fut = item[-1]
+                if not fut.done():
+                    fut.set_result(plan_dict)
+            return
+
+        if plans is not None:
+            log.warning("Batched reply had the wrong shape; falling back to single calls",
+                        extra={"batch_size": len(batch)})
+        await asyncio.gather(*(self._single(*item) for item in batch))
+
+
+def _normalize_plan_dict(plan_dict: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    One in-place pass over common LLM misformats, BEFORE plan validation:
+
+    - ISO strings in time_window.from_ts/to_ts move to from_iso/to_iso (unless
+      those are already set) and the *_ts fields are cleared so the backend
+      can fill them; fractional epoch seconds are truncated to ints.
+    - A fractional aggregation.top_k (e.g. 20.5) is truncated to an int.
+    - A percentage confidence (e.g. 85) is scaled to 0..1.
+
+    Numeric strings ("0.8") are left to the lax validator.
     """
     tw = plan_dict.get("time_window")
-    if not isinstance(tw, dict):
-        return plan_dict
-
-    from_ts = tw.get("from_ts")
-    to_ts = tw.get("to_ts")
-
-    # If from_ts is a string like "2025-11-12T00:00:00+07:00", treat it as from_iso
-    if isinstance(from_ts, str):
-        if not tw.get("from_iso"):
-            tw["from_iso"] = from_ts
-        # Clear from_ts so it can be set later by backend as float
-        tw["from_ts"] = None
-
-    # Same for to_ts
-    if isinstance(to_ts, str):
-        if not tw.get("to_iso"):
-            tw["to_iso"] = to_ts
-        tw["to_ts"] = None
-
-    plan_dict["time_window"] = tw
+    if isinstance(tw, dict):
+        # e.g. from_ts="2025-11-12T00:00:00+07:00": treat it as from_iso
+        f, t = tw.get("from_ts"), tw.get("to_ts")
+        if isinstance(f, str):
+            if not tw.get("from_iso"):
+                tw["from_iso"] = f
+            tw["from_ts"] = None
+        if isinstance(t, str):
+            if not tw.get("to_iso"):
+                tw["to_iso"] = t
+            tw["to_ts"] = None
+        if isinstance(f, float):
+            tw["from_ts"] = int(f)
+        if isinstance(t, float):
+            tw["to_ts"] = int(t)
+
+    agg = plan_dict.get("aggregation")
+    if isinstance(agg, dict) and isinstance(agg.get("top_k"), float):
+        agg["top_k"] = int(agg["top_k"])
+
+    conf = plan_dict.get("confidence")
+    if isinstance(conf, (int, float)) and 1.0 < conf <= 100.0:
+        plan_dict["confidence"] = conf / 100.0
+
     return plan_dict
 
 
+def _window_is_fixed(plan: VisionQueryPlan, day_start: int) -> bool:
+    """
+    True if the plan's time window cannot move for the rest of the day, so
+    a same-day cache hit is still correct: no window at all, or one ending by
+    today's local midnight ("yesterday", past dates). Windows reaching into
+    today ("today", "last hour", "last 7 days") are relative to now.
+    """
+    tw = plan.time_window
+    if tw.from_ts is None and tw.to_ts is None:
+        return tw.from_iso is None and tw.to_iso is None
+    return tw.to_ts is not None and tw.to_ts <= day_start
+
+
 async def build_plan(
     cfg: VisionReasonerConfig,
     cameras_registry: Dict[str, Any],
@@ -197,39 +592,115 @@ async def build_plan(
     now_iso: str,
     timezone: str,
     user_query: str,
+    exact_cache: Optional[ExactPlanCache] = None,
+    semantic_cache: Optional[SemanticPlanCache] = None,
+    batcher: Optional[PlanBatcher] = None,
+    registries: Optional[Registries] = None,
 ) -> VisionQueryPlan:
     """
     Top-level orchestration: build developer prompt, call LLM, normalize output,
-    validate into VisionQueryPlan.
+    validate into VisionQueryPlan, with time_window.from_ts/to_ts filled.
+
+    Templated DIRECT commands (direct_plan) are planned without the LLM.
+    With an `exact_cache`, the same query (case/whitespace-insensitive) asked
+    again the same day is answered from cache. With a `semantic_cache`, a
+    paraphrase of an earlier query (same registries, same day) returns a copy
+    of that plan without calling the LLM. Only plans whose window does not
+    depend on the current time are cached (_window_is_fixed). With a `batcher`, the LLM call may
+    be shared with other concurrent requests.
+
+    Pass `registries` (Registries.build at config load) to skip the per-call
+    lookup of the serialized registries; otherwise they are built from the
+    three dicts on first use.
     """
-    log.info(
-        "Building reasoning plan",
-        extra={"query": user_query, "now": now_iso, "timezone": timezone},
-    )
-
-    developer_prompt = build_developer_prompt(
-        cameras_registry=cameras_registry,
-        zones_registry=zones_registry,
-        event_types=event_types,
-        now_iso=now_iso,
-        timezone=timezone,
-    )
-
-    plan_dict = await call_ollama_chat(
-        cfg=cfg,
-        system_prompt=VISION_SYSTEM_PROMPT,
-        developer_prompt=developer_prompt,
-        user_query=user_query,
-    )
+    if log.isEnabledFor(logging.INFO):
+        log.info(
+            "Building reasoning plan",
+            extra={"query": user_query, "now": now_iso, "timezone": timezone},
+        )
 
-    # --- NEW: normalize time_window fields before Pydantic validation ---
-    plan_dict = _normalize_time_window_fields(plan_dict)
+    if registries is None:
+        registries = _registries(cameras_registry, zones_registry, event_types)
+    fingerprint = registries.fingerprint
+
+    if cfg.direct_fast_path:
+        direct = match_direct_plan(user_query, registries.places, registries.zones, now_iso, timezone)
+        if direct is not None:
+            try:
+                plan = plan_from_dict(direct)
+            except msgspec.ValidationError:
+                log.exception("Direct plan validation error; falling back to the LLM")
+            else:
+                log.info("Direct command planned locally", extra={"query": user_query})
+                return plan
+
+    today = now_iso[:10]
+    exact_key = ExactPlanCache.key(user_query, fingerprint, today, cfg.ollama_model)
+    if exact_cache is not None:
+        hit = exact_cache.get(exact_key)
+        if hit is not None:
+            log.info("Exact plan cache hit", extra={"query": user_query})
+            return plan_from_dict(copy.deepcopy(hit))
+
+    query_vec = None
+    if semantic_cache is not None:
+        query_vec = await semantic_cache.embed(user_query)
+        if query_vec is not None:
+            hit = semantic_cache.lookup(query_vec, fingerprint, today)
+            if hit is not None:
+                if exact_cache is not None:
+                    exact_cache.put(exact_key, hit)
+                return plan_from_dict(copy.deepcopy(hit))
+
+    developer_prompt = build_developer_prompt(registries)
+
+    plan: Optional[VisionQueryPlan] = None
+    if batcher is not None:
+        plan_dict = await batcher.submit(developer_prompt, user_query, now_iso, timezone)
+    else:
+        content = await _chat_content(
+            cfg=cfg,
+            system_prompt=VISION_SYSTEM_PROMPT,
+            developer_prompt=developer_prompt,
+            user_query=user_message(now_iso, timezone, user_query),
+        )
+        # Fast path: a well-formed reply decodes straight into the plan
+        # structs. Anything else (prose around the JSON, quirks that
+        # _normalize_plan_dict repairs) takes the dict route below.
+        try:
+            plan = plan_from_json(content)
+        except msgspec.DecodeError:
+            plan_dict = _parse_plan_json(content)
+
+    if plan is None and cfg.ollama_format == "schema":
+        # Schema-constrained decoding already rules out the misformats
+        # _normalize_plan_dict repairs; only fall back to it if the model
+        # (or an older Ollama ignoring "format") slipped one through.
+        try:
+            plan = plan_from_dict(plan_dict)
+        except msgspec.ValidationError:
+            log.warning("Schema-decoded plan failed validation; normalizing")
 
-    try:
-        plan = VisionQueryPlan.model_validate(plan_dict)
-    except ValidationError as ve:
-        log.exception("Plan validation error")
-        raise RuntimeError(f"Plan validation error: {ve}\nPlan: {plan_dict}") from ve
+    if plan is None:
+        plan_dict = _normalize_plan_dict(plan_dict)
+        try:
+            plan = plan_from_dict(plan_dict)
+        except msgspec.ValidationError as ve:
+            log.exception("Plan validation error")
+            raise RuntimeError(f"Plan validation error: {ve}\nPlan: {plan_dict}") from ve
+
+    # LLM decides from_iso/to_iso; we just parse to epoch seconds. Cached
+    # copies (and direct plans) already carry them.
+    fill_timestamps_from_iso(plan, timezone_str=timezone)
+
+    if (exact_cache is not None or query_vec is not None) and _window_is_fixed(
+        plan, day_start_ts(now_iso, timezone)
+    ):
+        cached = plan_to_dict(plan)
+        if exact_cache is not None:
+            exact_cache.put(exact_key, cached)
+        if query_vec is not None:
+            semantic_cache.add(query_vec, fingerprint, today, cached)
 
     log.info(
         "Reasoning plan built successfully",
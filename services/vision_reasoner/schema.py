@@ -1,9 +1,10 @@
 # services/vision_reasoner/schema.py
 from __future__ import annotations
 
-from typing import List, Literal, Optional, Dict, Any
+from typing import Annotated, List, Literal, Optional, Dict, Any, Tuple
 
-from pydantic import BaseModel, Field
+import msgspec
+from msgspec import Meta, field
 
 
 # Primitive enums / literals
@@ -14,30 +15,27 @@ AggregationMode = Literal["raw_events", "timeline", "pattern_summary"]
 OutputFormat = Literal["clips", "frames", "text_summary", "clips_plus_summary"]
 
 
-class RelativeTime(BaseModel):
+class RelativeTime(msgspec.Struct, kw_only=True):
     """
     Optional human-oriented description of a relative window.
     Example: keyword="yesterday", offset_days=1
     """
 
-    keyword: str = Field(
-        ...,
-        description=(
-            "Optional human label like 'yesterday', 'last_night_after_22', "
-            "'two_days_ago', 'last_14_days'. Used for explanation."
-        ),
-    )
-    offset_days: Optional[int] = Field(
-        None,
+    keyword: Annotated[str, Meta(description=(
+        "Optional human label like 'yesterday', 'last_night_after_22', "
+        "'two_days_ago', 'last_14_days'. Used for explanation."
+    ))]
+    offset_days: Annotated[Optional[int], Meta(
         description="If applicable, number of days in the past.",
-    )
+    )] = None
 
 
-class TimeWindow(BaseModel):
+class TimeWindow(msgspec.Struct, kw_only=True):
     """
     Time resolution:
       - The LLM decides from_iso / to_iso (ISO-8601, with timezone).
-      - Backend converts to from_ts / to_ts as epoch seconds.
+      - Backend converts to from_ts / to_ts as epoch seconds, once, in
+        reasoner.build_plan (time_utils.fill_timestamps_from_iso).
 
     Types:
       - relative: expressions like 'yesterday', 'last night', 'last 7 days'
@@ -48,128 +46,133 @@ class TimeWindow(BaseModel):
     type: TimeWindowType
 
     # LLM outputs concrete ISO start/end, e.g. "2025-11-12T00:00:00+07:00"
-    from_iso: Optional[str] = Field(
-        None,
+    from_iso: Annotated[Optional[str], Meta(
         description="ISO-8601 start time (with timezone) decided by the LLM.",
-    )
-    to_iso: Optional[str] = Field(
-        None,
+    )] = None
+    to_iso: Annotated[Optional[str], Meta(
         description="ISO-8601 end time (with timezone) decided by the LLM.",
-    )
+    )] = None
 
-    # Backend populates from these ISO values
-    from_ts: Optional[float] = Field(
-        None,
+    # Backend populates from these ISO values (whole seconds is plenty for clips)
+    from_ts: Annotated[Optional[int], Meta(
         description="Epoch seconds for start time (backend fills from from_iso).",
-    )
-    to_ts: Optional[float] = Field(
-        None,
+    )] = None
+    to_ts: Annotated[Optional[int], Meta(
         description="Epoch seconds for end time (backend fills from to_iso).",
-    )
+    )] = None
 
     # Optional relative descriptor, mainly for debugging / transparency
     relative: Optional[RelativeTime] = None
 
 
-class TargetScope(BaseModel):
+class TargetScope(msgspec.Struct, kw_only=True):
     """
     What part of the home / which cameras the question applies to.
     """
 
-    cameras: List[str] = Field(
-        default_factory=list,
+    # tuples: read-only after planning, and no per-plan list allocation
+    cameras: Annotated[Tuple[str, ...], Meta(
         description="Concrete camera IDs e.g. ['street', 'gate_left']",
-    )
-    zones: List[str] = Field(
-        default_factory=list,
+    )] = ()
+    zones: Annotated[Tuple[str, ...], Meta(
         description="Logical zones e.g. ['front_gate', 'dining_area']",
-    )
-    scope_type: ScopeType = Field(
-        ...,
+    )] = ()
+    scope_type: Annotated[ScopeType, Meta(
         description="'camera' | 'zone' | 'whole_house'",
-    )
+    )]
 
 
-class EventFilter(BaseModel):
+class EventFilter(msgspec.Struct, kw_only=True):
     """
     Semantic filter for what kinds of events we care about.
     """
 
-    subjects: List[str] = Field(
-        default_factory=list,
+    subjects: Annotated[List[str], Meta(
         description="Semantic subjects e.g. ['person', 'vehicle', 'pet']",
-    )
-    activities: List[str] = Field(
-        default_factory=list,
+    )] = field(default_factory=list)
+    activities: Annotated[List[str], Meta(
         description="Activities e.g. ['entering', 'leaving', 'sitting']",
-    )
-    confidence_threshold: float = Field(
-        0.4,
+    )] = field(default_factory=list)
+    confidence_threshold: Annotated[float, Meta(
         description="Minimum confidence for events to be considered.",
-    )
+    )] = 0.4
 
 
-class Aggregation(BaseModel):
+class Aggregation(msgspec.Struct, kw_only=True):
     """
     How we want results aggregated.
     """
 
-    mode: AggregationMode = Field(
-        ...,
+    mode: Annotated[AggregationMode, Meta(
         description="'raw_events' | 'timeline' | 'pattern_summary'",
-    )
-    group_by: List[str] = Field(
-        default_factory=list,
+    )]
+    group_by: Annotated[List[str], Meta(
         description="E.g. ['hour_of_day'] for pattern_summary.",
-    )
-    top_k: int = Field(
-        100,
+    )] = field(default_factory=list)
+    top_k: Annotated[int, Meta(
         description="Maximum number of events/items to retrieve from RAG.",
-    )
+    )] = 100
 
 
-class VisionQueryPlan(BaseModel):
+class VisionQueryPlan(msgspec.Struct, kw_only=True):
     """
     Full plan produced by the LLM for a camera/RAG query.
     This is what we validate in reasoner.py and execute in executor.py.
     """
 
-    command_type: CommandType = Field(
-        ...,
+    command_type: Annotated[CommandType, Meta(
         description="'direct' | 'semi_direct' | 'indirect'",
-    )
+    )]
     target_scope: TargetScope
     time_window: TimeWindow
     event_filter: EventFilter
     aggregation: Aggregation
-    output_format: OutputFormat = Field(
-        ...,
+    output_format: Annotated[OutputFormat, Meta(
         description="'clips' | 'frames' | 'text_summary' | 'clips_plus_summary'",
-    )
-
-    needs_clarification: bool = Field(
-        False,
-        description=(
-            "If true, backend should not call RAG yet. "
-            "Instead, ask the user clarification_question."
-        ),
-    )
-    clarification_question: Optional[str] = Field(
-        None,
+    )]
+
+    needs_clarification: Annotated[bool, Meta(description=(
+        "If true, backend should not call RAG yet. "
+        "Instead, ask the user clarification_question."
+    ))] = False
+    clarification_question: Annotated[Optional[str], Meta(
         description="Single short clarification question for the user.",
-    )
-    reason_brief: str = Field(
-        "",
+    )] = None
+    reason_brief: Annotated[str, Meta(
         description="Short explanation of how the request was interpreted.",
-    )
-    confidence: float = Field(
-        0.0,
+    )] = ""
+    confidence: Annotated[float, Meta(
         ge=0.0,
         le=1.0,
         description="LLM self-estimated confidence in this plan.",
-    )
+    )] = 0.0
 
-    extra: Dict[str, Any] = Field(
-        default_factory=dict,
+    extra: Annotated[Optional[Dict[str, Any]], Meta(
         description="Reserved for future extensions; ignored by core engine.",
-    )
+    )] = None
+
+
+def plan_from_dict(plan_dict: Dict[str, Any]) -> VisionQueryPlan:
+    """
+    Validate a decoded plan dict. Lax mode, like the Pydantic models this
+    replaced: "0.8" -> 0.8, 5.0 -> 5; unknown keys are ignored.
+    Raises msgspec.ValidationError.
+    """
+    return msgspec.convert(plan_dict, type=VisionQueryPlan, strict=False)
+
+
+# Compiled once: field names and Literal values are resolved up front
+_PLAN_DECODER = msgspec.json.Decoder(VisionQueryPlan, strict=False)
+
+
+def plan_from_json(data: bytes | str) -> VisionQueryPlan:
+    """
+    Decode + validate plan JSON in one pass, without an intermediate dict.
+    Raises msgspec.DecodeError (ValidationError is a subclass).
+    """
+    return _PLAN_DECODER.decode(data)
+
+
+def plan_to_dict(plan: VisionQueryPlan) -> Dict[str, Any]:
+    """JSON-ready dict of a plan (all fields, Nones included)."""
+    return msgspec.to_builtins(plan)
@@ -1,48 +1,83 @@
 # services/vision_reasoner/time_utils.py
 from __future__ import annotations
+import calendar
+import functools
+import re
 from datetime import datetime
 from typing import Optional
 
 from zoneinfo import ZoneInfo
 
+from msgspec.structs import replace
+
 from common.logging import get_logger
 
 log = get_logger("vision_reasoner")
 
 
-def _parse_iso(iso_str: str, timezone_str: str) -> Optional[float]:
+_TZ = functools.lru_cache(maxsize=8)(ZoneInfo)
+
+# What the LLM emits almost always: "2025-11-12T00:00:00+07:00" (or "...Z")
+_ISO_OFFSET_RE = re.compile(
+    r"(\d{4})-(\d{2})-(\d{2})T(\d{2}):(\d{2}):(\d{2})(?:([+-])(\d{2}):(\d{2})|Z)"
+)
+
+
+def _parse_iso(iso_str: str, timezone_str: str) -> Optional[int]:
     """
-    Parse ISO-8601 string to epoch seconds, normalizing to the given timezone.
+    Parse ISO-8601 string to whole epoch seconds; strings without an offset are
+    taken to be in the given timezone.
     Does NOT interpret natural language; it only parses what the LLM has decided.
     """
     if not iso_str:
         return None
 
+    # Fast path for fully-specified offsets: straight to epoch, no datetime
+    m = _ISO_OFFSET_RE.fullmatch(iso_str)
+    if m:
+        y, mo, d, hh, mi, ss = (int(g) for g in m.groups()[:6])
+        oh, om = (int(m.group(8)), int(m.group(9))) if m.group(7) else (0, 0)
+        if (1 <= mo <= 12 and 1 <= d <= calendar.monthrange(y, mo)[1] and hh < 24 and mi < 60 and ss < 60
+                and oh < 24 and om < 60):
+            offset = oh * 3600 + om * 60
+            if m.group(7) == "-":
+                offset = -offset
+            return calendar.timegm((y, mo, d, hh, mi, ss, 0, 0, 0)) - offset
+
     try:
         dt = datetime.fromisoformat(iso_str)
     except Exception:
         log.warning("Failed to parse from_iso/to_iso; expected ISO-8601", extra={"value": iso_str})
         return None
 
-    tz = ZoneInfo(timezone_str)
-
+    # epoch is timezone-invariant; only naive values need one attached
     if dt.tzinfo is None:
-        dt = dt.replace(tzinfo=tz)
-    else:
-        dt = dt.astimezone(tz)
+        dt = dt.replace(tzinfo=_TZ(timezone_str))
+
+    return int(dt.timestamp())
+
 
-    return dt.timestamp()
+def day_start_ts(now_iso: str, timezone_str: str) -> int:
+    """
+    Epoch seconds of local midnight on the day of `now_iso` (taken to be in
+    the given timezone when it has no offset).
+    """
+    now = datetime.fromisoformat(now_iso)
+    if now.tzinfo is None:
+        now = now.replace(tzinfo=_TZ(timezone_str))
+    return int(now.replace(hour=0, minute=0, second=0, microsecond=0).timestamp())
 
 
 def fill_timestamps_from_iso(plan, timezone_str: str) -> None:
     """
     If the plan has time_window.from_iso/to_iso, derive from_ts/to_ts.
-    This mutates the plan in-place; no semantic rules, just parsing.
+    The plan gets a new TimeWindow with them set (the old one is left
+    untouched); no semantic rules, just parsing.
     """
     tw = plan.time_window
 
-    if tw.from_iso and not tw.from_ts:
-        tw.from_ts = _parse_iso(tw.from_iso, timezone_str)
+    from_ts = _parse_iso(tw.from_iso, timezone_str) if tw.from_iso and not tw.from_ts else tw.from_ts
+    to_ts = _parse_iso(tw.to_iso, timezone_str) if tw.to_iso and not tw.to_ts else tw.to_ts
 
-    if tw.to_iso and not tw.to_ts:
-        tw.to_ts = _parse_iso(tw.to_iso, timezone_str)
+    if from_ts != tw.from_ts or to_ts != tw.to_ts:
+        plan.time_window = replace(tw, from_ts=from_ts, to_ts=to_ts)
@@ -0,0 +1,49 @@
+import asyncio
+
+import httpx
+import orjson
+import pytest
+
+from services.vision_reasoner.executor import RagClient
+
+
+def _client_capturing(bodies):
+    def handler(request: httpx.Request) -> httpx.Response:
+        bodies.append(orjson.loads(request.content))
+        return httpx.Response(200, json={"results": []})
+
+    rag = RagClient(base_url="http://rag.test")
+    rag._client = httpx.AsyncClient(base_url=rag.base_url, transport=httpx.MockTransport(handler))
+    return rag
+
+
+@pytest.mark.parametrize("top_k, sent", [(0, 1), (-5, 1), (500, 100), (20, 20)])
+def test_search_clamps_top_k_to_frames_rag_bounds(top_k, sent):
+    bodies = []
+    rag = _client_capturing(bodies)
+
+    async def run():
+        try:
+            await rag.search("people", top_k=top_k)
+        finally:
+            await rag.aclose()
+
+    asyncio.run(run())
+    assert bodies[0]["top_k"] == sent
+
+
+def test_search_cache_hit_is_not_shared_with_callers():
+    bodies = []
+    rag = _client_capturing(bodies)
+
+    async def run():
+        try:
+            first = await rag.search("people")
+            first["results"].append("mutated")
+            return await rag.search("people")
+        finally:
+            await rag.aclose()
+
+    second = asyncio.run(run())
+    assert len(bodies) == 1
+    assert second == {"results": []}